@@ -0,0 +1,111 @@
+# src/achievement_rules.py
+from bisect import bisect_right
+from datetime import date, timedelta
+import numpy as np
+from storage import get_connection, timed
+from rollups import iso_week
+
+# Tipo de condición -> métrica de StatsTracker.get_achievement_metrics()
+CONDITION_METRICS = {
+    "session_count": "total_sessions",
+    "total_sessions": "lifetime_sessions",
+    "daily_streak": "current_streak",
+    "early_session": "early_sessions",
+    "weekly_completion": "weekly_days_completed",
+}
+
+
+class RuleIndex:
+    """Índice de umbrales de logros por métrica
+
+    Compila las filas (id, nombre, condition_type, condition_value) en una
+    lista de umbrales ordenada por métrica, de modo que al cambiar una
+    métrica solo se miran los logros cuyo umbral cae en el tramo recorrido.
+    Los tipos de condición desconocidos se ignoran.
+    """
+
+    def __init__(self, rows):
+        self.rules = {}  # métrica -> [(umbral, logro_id, nombre)] ordenada
+        for ach_id, name, cond_type, cond_value in rows:
+            metric = CONDITION_METRICS.get(cond_type)
+            if metric is not None:
+                self.rules.setdefault(metric, []).append((cond_value, ach_id, name))
+
+        self.thresholds = {}  # métrica -> [umbral], para bisect
+        for metric, rules in self.rules.items():
+            rules.sort()
+            self.thresholds[metric] = [rule[0] for rule in rules]
+
+    def codes(self):
+        """Código entero de cada logro indexado, para operar con arrays"""
+        ids = sorted(rule[1] for rules in self.rules.values() for rule in rules)
+        return {ach_id: code for code, ach_id in enumerate(ids)}
+
+    def threshold_array(self, metric):
+        """Umbrales ordenados de una métrica como array"""
+        return np.array(self.thresholds.get(metric, []), dtype=np.int64)
+
+    def metrics(self):
+        """Métricas con al menos un logro"""
+        return self.rules.keys()
+
+    def above(self, metric, value=None):
+        """Logros de una métrica con umbral mayor que value (todos si es None)"""
+        thresholds = self.thresholds.get(metric)
+        if not thresholds:
+            return []
+        low = 0 if value is None else bisect_right(thresholds, value)
+        return self.rules[metric][low:]
+
+    def reached(self, metric, value, previous=None):
+        """Logros de una métrica alcanzados al pasar de previous a value
+
+        Sin valor previo devuelve todos los umbrales <= value; si la métrica
+        no ha subido no devuelve ninguno.
+        """
+        thresholds = self.thresholds.get(metric)
+        if not thresholds:
+            return []
+        high = bisect_right(thresholds, value)
+        low = 0 if previous is None else bisect_right(thresholds, previous)
+        return self.rules[metric][low:high]
+
+
+def load_metric_arrays(stats_db_path, today=None):
+    """Cargar las métricas de logros de todos los usuarios en arrays
+
+    Lee lifetime_stats y aplica de forma vectorizada las mismas reglas que
+    streaks.summarize(): la racha caduca si el último día activo es anterior
+    a ayer y los días de la semana solo cuentan en la semana actual.
+    Devuelve (usuarios, {métrica: array}).
+    """
+    today = today or date.today().isoformat()
+    yesterday = (date.fromisoformat(today) - timedelta(days=1)).isoformat()
+
+    conn = get_connection(stats_db_path)
+    with timed("achievements.load_metric_arrays"):
+        rows = conn.execute("""
+        SELECT user_id, total_sessions, current_streak, COALESCE(last_active_day, ''),
+               early_sessions, COALESCE(week, ''), week_days
+        FROM lifetime_stats
+        ORDER BY user_id
+        """).fetchall()
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), {metric: np.empty(0, dtype=np.int64)
+                                             for metric in CONDITION_METRICS.values()}
+
+    users, total, streak, last_day, early, week, week_days = zip(*rows)
+    total = np.array(total, dtype=np.int64)
+    streak = np.where(np.array(last_day) >= yesterday, np.array(streak, dtype=np.int64), 0)
+    week_days = np.where(np.array(week) == iso_week(today),
+                         np.array(week_days, dtype=np.uint8), 0).astype(np.uint8)
+    days_completed = np.unpackbits(week_days[:, None], axis=1).sum(axis=1).astype(np.int64)
+
+    return np.array(users, dtype=np.int64), {
+        "total_sessions": total,
+        "lifetime_sessions": total,
+        "current_streak": streak,
+        "early_sessions": np.array(early, dtype=np.int64),
+        "weekly_days_completed": days_completed,
+    }
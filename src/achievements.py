@@ -1,49 +1,61 @@
 # src/achievements.py
-import sqlite3
+import numpy as np
 from PyQt5.QtCore import QObject, pyqtSignal
+from storage import get_connection, transaction, timed
+from achievement_rules import RuleIndex, load_metric_arrays
 
 class AchievementSystem(QObject):
     achievement_unlocked = pyqtSignal(str, str)  # (logro_id, nombre_logro)
     
-    def __init__(self):
+    def __init__(self, db_path="database/achievements.db"):
         super().__init__()
-        self.db_path = "database/achievements.db"
+        self.db_path = db_path
         self.init_db()
+        
+        self.rules = None
+        self.user_state = {}  # usuario -> {"metrics": {...}, "unlocked": set()}
+        self.load_rules()
     
     def init_db(self):
         """Inicializar base de datos de logros"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Tabla de definición de logros
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS achievements (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            description TEXT NOT NULL,
-            icon TEXT NOT NULL,
-            condition_type TEXT NOT NULL,
-            condition_value INTEGER NOT NULL
-        )
-        """)
-        
-        # Tabla de logros desbloqueados por el usuario
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_achievements (
-            user_id INTEGER,
-            achievement_id TEXT,
-            unlocked_at TEXT,
-            PRIMARY KEY (user_id, achievement_id)
-        )
-        """)
-        
-        # Insertar logros básicos si no existen
-        cursor.execute("SELECT COUNT(*) FROM achievements")
-        if cursor.fetchone()[0] == 0:
-            self.create_default_achievements(cursor)
-        
-        conn.commit()
-        conn.close()
+        with transaction(self.db_path) as cursor:
+            # Tabla de definición de logros
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS achievements (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                description TEXT NOT NULL,
+                icon TEXT NOT NULL,
+                condition_type TEXT NOT NULL,
+                condition_value INTEGER NOT NULL
+            )
+            """)
+            
+            # Tabla de logros desbloqueados por el usuario
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_achievements (
+                user_id INTEGER,
+                achievement_id TEXT,
+                unlocked_at TEXT,
+                PRIMARY KEY (user_id, achievement_id)
+            )
+            """)
+            
+            # Progreso de cada usuario hacia los logros aún bloqueados
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS achievement_progress (
+                user_id INTEGER NOT NULL,
+                achievement_id TEXT NOT NULL,
+                progress INTEGER NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (user_id, achievement_id)
+            ) WITHOUT ROWID
+            """)
+            
+            # Insertar logros básicos si no existen
+            cursor.execute("SELECT COUNT(*) FROM achievements")
+            if cursor.fetchone()[0] == 0:
+                self.create_default_achievements(cursor)
     
     def create_default_achievements(self, cursor):
         """Crear logros predeterminados"""
@@ -60,68 +72,215 @@ class AchievementSystem(QObject):
         VALUES (?, ?, ?, ?, ?, ?)
         """, default_achievements)
     
+    def load_rules(self):
+        """Compilar las definiciones de logros en el índice de umbrales"""
+        conn = get_connection(self.db_path)
+        rows = conn.execute("""
+        SELECT id, name, condition_type, condition_value FROM achievements
+        """).fetchall()
+        self.rules = RuleIndex(rows)
+        # Los umbrales han podido cambiar: reevaluar desde cero
+        self.user_state.clear()
+    
+    def get_user_state(self, user_id):
+        """Obtener las últimas métricas vistas y los logros del usuario"""
+        state = self.user_state.get(user_id)
+        if state is None:
+            conn = get_connection(self.db_path)
+            rows = conn.execute("""
+            SELECT achievement_id FROM user_achievements WHERE user_id = ?
+            """, (user_id,)).fetchall()
+            state = self.user_state[user_id] = {
+                "metrics": {},
+                "unlocked": {row[0] for row in rows}
+            }
+        return state
+    
     def check_achievements(self, user_id, stats):
-        """Verificar si se han desbloqueado nuevos logros"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Verificar si se han desbloqueado nuevos logros
         
-        # Obtener todos los logros no desbloqueados
-        cursor.execute("""
-        SELECT a.id, a.name, a.condition_type, a.condition_value 
-        FROM achievements a
-        LEFT JOIN user_achievements ua ON a.id = ua.achievement_id AND ua.user_id = ?
-        WHERE ua.achievement_id IS NULL
-        """, (user_id,))
-        
-        potential_achievements = cursor.fetchall()
+        Solo se evalúan los logros de las métricas que han subido desde la
+        última llamada. Los desbloqueos y el progreso de los logros cuyo
+        valor cambia se guardan en una sola transacción.
+        """
+        state = self.get_user_state(user_id)
         
         unlocked = []
+        progress = []
+        for metric in self.rules.metrics():
+            value = stats.get(metric)
+            previous = state["metrics"].get(metric)
+            if value is None or value == previous:
+                continue
+            for _, ach_id, name in self.rules.reached(metric, value, previous):
+                if ach_id not in state["unlocked"]:
+                    unlocked.append((ach_id, name))
+            
+            # Solo cambia el progreso de los umbrales por encima del menor valor
+            lowest = None if previous is None else min(previous, value)
+            for threshold, ach_id, _ in self.rules.above(metric, lowest):
+                if ach_id not in state["unlocked"]:
+                    progress.append((user_id, ach_id, min(value, threshold)))
         
-        for ach_id, name, cond_type, cond_value in potential_achievements:
-            if self.check_condition(cond_type, cond_value, stats):
-                unlocked.append((ach_id, name))
-                # Registrar logro desbloqueado
-                cursor.execute("""
-                INSERT INTO user_achievements (user_id, achievement_id, unlocked_at)
+        if unlocked or progress:
+            with transaction(self.db_path, "achievements.check_achievements") as cursor:
+                cursor.executemany("""
+                INSERT OR IGNORE INTO user_achievements (user_id, achievement_id, unlocked_at)
                 VALUES (?, ?, datetime('now'))
-                """, (user_id, ach_id))
+                """, [(user_id, ach_id) for ach_id, _ in unlocked])
+                self.save_progress(cursor, progress)
+            state["unlocked"].update(ach_id for ach_id, _ in unlocked)
+        state["metrics"].update(stats)
+        
+        # Emitir señales una vez confirmada la transacción
+        for ach_id, name in unlocked:
+            self.achievement_unlocked.emit(ach_id, name)
+        return unlocked
+    
+    def save_progress(self, cursor, rows):
+        """Guardar filas (usuario, logro, progreso) en la transacción abierta"""
+        cursor.executemany("""
+        INSERT INTO achievement_progress (user_id, achievement_id, progress, updated_at)
+        VALUES (?, ?, ?, datetime('now'))
+        ON CONFLICT(user_id, achievement_id) DO UPDATE SET
+            progress = excluded.progress,
+            updated_at = excluded.updated_at
+        WHERE progress != excluded.progress
+        """, rows)
+    
+    def check_achievements_batch(self, stats_db_path="database/stats.db", today=None):
+        """Evaluar los logros de todos los usuarios en una pasada vectorizada
+        
+        Pensado para recalcular tras una importación masiva: carga las
+        métricas de todos los usuarios en arrays, las compara con los umbrales
+        ordenados de cada métrica, inserta los desbloqueos nuevos de una vez,
+        y sustituye el progreso guardado de los logros aún bloqueados. No
+        emite señales: se llama desde scripts, fuera de la interfaz.
+        Devuelve {usuario: [logro_id, ...]}.
+        """
+        codes = self.rules.codes()
+        if not codes:
+            return {}
+        users, metrics = load_metric_arrays(stats_db_path, today)
+        ach_ids = np.array(sorted(codes, key=codes.get), dtype=object)
+        
+        with timed("achievements.check_batch"):
+            candidates = []
+            progress = []
+            for metric in self.rules.metrics():
+                thresholds = self.rules.threshold_array(metric)
+                rule_codes = np.array([codes[rule[1]] for rule in self.rules.rules[metric]])
                 
-                # Emitir señal
-                self.achievement_unlocked.emit(ach_id, name)
+                # Progreso de cada usuario con valor > 0 hacia cada umbral
+                active = metrics[metric] > 0
+                values = np.minimum(metrics[metric][active][:, None], thresholds[None, :])
+                progress.append((
+                    np.repeat(users[active], len(thresholds)),
+                    np.tile(rule_codes, int(active.sum())),
+                    values.ravel()
+                ))
+                
+                # Los umbrales están ordenados: cada usuario alcanza un prefijo
+                reached = np.searchsorted(thresholds, metrics[metric], side="right")
+                total = int(reached.sum())
+                if total == 0:
+                    continue
+                user_index = np.repeat(np.arange(len(users)), reached)
+                starts = np.repeat(np.cumsum(reached) - reached, reached)
+                rule_index = np.arange(total) - starts
+                candidates.append(users[user_index] * len(codes) + rule_codes[rule_index])
+            
+            candidates = np.unique(np.concatenate(candidates or [np.empty(0, dtype=np.int64)]))
+            
+            conn = get_connection(self.db_path)
+            existing = np.array([
+                user_id * len(codes) + codes[ach_id]
+                for user_id, ach_id in conn.execute(
+                    "SELECT user_id, achievement_id FROM user_achievements"
+                )
+                if ach_id in codes
+            ], dtype=np.int64)
+            new = candidates[~np.isin(candidates, existing)]
+            unlocked_keys = np.concatenate([existing, new])
+        
+        new_users = new // len(codes)
+        new_ids = ach_ids[new % len(codes)]
+        with transaction(self.db_path, "achievements.insert_batch") as cursor:
+            cursor.executemany("""
+            INSERT OR IGNORE INTO user_achievements (user_id, achievement_id, unlocked_at)
+            VALUES (?, ?, datetime('now'))
+            """, zip(new_users.tolist(), new_ids.tolist()))
+            
+            # El lote cubre a todos los usuarios: sustituir el progreso guardado
+            placeholders = ", ".join("?" for _ in codes)
+            cursor.execute(f"""
+            DELETE FROM achievement_progress WHERE achievement_id IN ({placeholders})
+            """, list(codes))
+            for user_ids, rule_codes, values in progress:
+                # Los logros desbloqueados no guardan progreso
+                keys = user_ids * len(codes) + rule_codes
+                keep = (values > 0) & ~np.isin(keys, unlocked_keys)
+                self.save_progress(cursor, zip(
+                    user_ids[keep].tolist(),
+                    ach_ids[rule_codes[keep]].tolist(),
+                    values[keep].tolist()
+                ))
+        
+        unlocked = {}
+        for user_id, ach_id in zip(new_users.tolist(), new_ids.tolist()):
+            unlocked.setdefault(user_id, []).append(ach_id)
         
-        conn.commit()
-        conn.close()
+        # Las métricas recordadas por usuario ya no son fiables
+        self.user_state.clear()
         return unlocked
     
-    def check_condition(self, cond_type, cond_value, stats):
-        """Verificar condición específica"""
-        if cond_type == "session_count":
-            return stats["total_sessions"] >= cond_value
-        elif cond_type == "daily_streak":
-            return stats["current_streak"] >= cond_value
-        elif cond_type == "total_sessions":
-            return stats["lifetime_sessions"] >= cond_value
-        elif cond_type == "early_session":
-            return stats["early_sessions"] >= cond_value
-        elif cond_type == "weekly_completion":
-            return stats["weekly_days_completed"] >= cond_value
-        return False
+    def get_achievement_progress(self, user_id):
+        """Obtener todos los logros con el progreso del usuario en una consulta"""
+        conn = get_connection(self.db_path)
+        
+        with timed("achievements.get_achievement_progress"):
+            rows = conn.execute("""
+            SELECT a.id, a.name, a.description, a.icon, a.condition_value,
+                   CASE WHEN ua.achievement_id IS NOT NULL THEN a.condition_value
+                        ELSE COALESCE(p.progress, 0) END,
+                   ua.unlocked_at
+            FROM achievements a
+            LEFT JOIN user_achievements ua
+                ON ua.user_id = ? AND ua.achievement_id = a.id
+            LEFT JOIN achievement_progress p
+                ON p.user_id = ? AND p.achievement_id = a.id
+            ORDER BY ua.unlocked_at IS NULL, a.condition_value
+            """, (user_id, user_id)).fetchall()
+        
+        return [
+            {
+                "id": row[0],
+                "name": row[1],
+                "description": row[2],
+                "icon": row[3],
+                "target": row[4],
+                "progress": row[5],
+                "unlocked": row[6] is not None,
+                "unlocked_at": row[6]
+            }
+            for row in rows
+        ]
     
     def get_unlocked_achievements(self, user_id):
         """Obtener logros desbloqueados por el usuario"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = get_connection(self.db_path)
         
-        cursor.execute("""
-        SELECT a.id, a.name, a.description, a.icon, ua.unlocked_at
-        FROM user_achievements ua
-        JOIN achievements a ON ua.achievement_id = a.id
-        WHERE ua.user_id = ?
-        ORDER BY ua.unlocked_at DESC
-        """, (user_id,))
+        with timed("achievements.get_unlocked_achievements"):
+            rows = conn.execute("""
+            SELECT a.id, a.name, a.description, a.icon, ua.unlocked_at
+            FROM user_achievements ua
+            JOIN achievements a ON ua.achievement_id = a.id
+            WHERE ua.user_id = ?
+            ORDER BY ua.unlocked_at DESC
+            """, (user_id,)).fetchall()
         
         achievements = []
-        for row in cursor.fetchall():
+        for row in rows:
             achievements.append({
                 "id": row[0],
                 "name": row[1],
@@ -130,5 +289,4 @@ class AchievementSystem(QObject):
                 "unlocked_at": row[4]
             })
         
-        conn.close()
         return achievements
\ No newline at end of file
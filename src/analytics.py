@@ -0,0 +1,241 @@
+# src/analytics.py
+import json
+import os
+from pathlib import Path
+import numpy as np
+from storage import get_connection, timed
+from archiver import iter_partitions
+
+# Columnas de la tabla en memoria; "day" son días desde 1970-01-01 (hora local)
+SESSION_DTYPE = np.dtype([
+    ("id", "i8"),
+    ("user", "i8"),
+    ("epoch", "i8"),
+    ("day", "i4"),
+    ("hour", "i1"),
+    ("duration", "i4"),
+    ("code", "i4"),
+    ("completed", "?"),
+])
+
+
+class SessionAnalytics:
+    """Almacén columnar de sesiones en arrays NumPy para consultas analíticas
+
+    Carga exercise_sessions una sola vez (o desde una instantánea mapeada en
+    memoria), añade sesiones nuevas de forma incremental y responde las
+    agrupaciones con operaciones vectorizadas.
+    """
+
+    def __init__(self, db_path="database/stats.db", user_id=None, chunk_size=50000):
+        self.db_path = db_path
+        self.user_id = user_id  # None carga todos los usuarios
+        self.chunk_size = chunk_size
+        suffix = "all" if user_id is None else f"user{user_id}"
+        self.snapshot_path = Path(db_path).with_suffix(f".sessions.{suffix}.npy")
+        self.meta_path = Path(db_path).with_suffix(f".sessions.{suffix}.json")
+
+        self.sessions = np.empty(0, dtype=SESSION_DTYPE)
+        self.exercise_codes = {}  # exercise_id -> código entero
+        self.exercise_ids = []    # código entero -> exercise_id
+        self.last_id = 0
+        self.saved_id = None  # last_id de la instantánea en disco
+
+        self.load_snapshot()
+        self.refresh()
+
+    def load_snapshot(self):
+        """Cargar la instantánea en disco si existe y es coherente"""
+        if not (self.snapshot_path.exists() and self.meta_path.exists()):
+            return False
+
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            sessions = np.load(self.snapshot_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"Error loading analytics snapshot: {e}")
+            return False
+
+        # Descartar instantáneas de otra base de datos o de una ya reiniciada, y
+        # las que mezclan el array de un guardado con los metadatos de otro
+        conn = get_connection(self.db_path)
+        max_id = conn.execute("SELECT MAX(id) FROM exercise_sessions").fetchone()[0] or 0
+        if (sessions.dtype != SESSION_DTYPE or meta["last_id"] > max_id
+                or meta.get("rows") != len(sessions)):
+            return False
+
+        self.sessions = sessions
+        self.exercise_ids = meta["exercise_ids"]
+        self.exercise_codes = {ex_id: i for i, ex_id in enumerate(self.exercise_ids)}
+        self.last_id = meta["last_id"]
+        self.saved_id = self.last_id
+        return True
+
+    def save_snapshot(self):
+        """Guardar la instantánea para arrancar en caliente la próxima vez
+
+        Cada archivo se escribe en un temporal y se renombra, así que nunca
+        queda uno a medias. Los metadatos guardan el número de filas: si un
+        cierre inesperado deja el array de un guardado con los metadatos de
+        otro, load_snapshot lo descarta. Sin sesiones nuevas no se escribe
+        nada: el array seguiría mapeado desde el archivo que se sustituye, y
+        en Windows no se puede reemplazar un archivo mapeado.
+        """
+        if self.saved_id == self.last_id:
+            return False
+        if isinstance(self.sessions, np.memmap):
+            # Copiar a memoria y soltar el mapeo antes de sustituir el archivo
+            self.sessions = np.array(self.sessions)
+        snapshot_tmp = self.snapshot_path.with_name(f"{self.snapshot_path.name}.{os.getpid()}.tmp")
+        meta_tmp = self.meta_path.with_name(f"{self.meta_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(snapshot_tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(self.sessions))
+            with open(meta_tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "last_id": self.last_id,
+                    "rows": len(self.sessions),
+                    "exercise_ids": self.exercise_ids
+                }, f, ensure_ascii=False)
+            os.replace(snapshot_tmp, self.snapshot_path)
+            os.replace(meta_tmp, self.meta_path)
+            self.saved_id = self.last_id
+            return True
+        finally:
+            for tmp_path in (snapshot_tmp, meta_tmp):
+                if tmp_path.exists():
+                    tmp_path.unlink()
+
+    def exercise_code(self, exercise_id):
+        """Obtener (o asignar) el código entero de un ejercicio"""
+        code = self.exercise_codes.get(exercise_id)
+        if code is None:
+            code = self.exercise_codes[exercise_id] = len(self.exercise_ids)
+            self.exercise_ids.append(exercise_id)
+        return code
+
+    def refresh(self):
+        """Añadir las sesiones registradas desde la última carga"""
+        conn = get_connection(self.db_path)
+
+        if self.user_id is None:
+            condition, params = "id > ?", (self.last_id,)
+        else:
+            # Usa el índice por usuario en lugar de recorrer toda la tabla
+            condition, params = "user_id = ? AND id > ?", (self.user_id, self.last_id)
+
+        # En una carga en frío se incluyen también las particiones archivadas
+        partitions = iter_partitions(conn) if self.last_id == 0 else ["main"]
+
+        chunks = []
+        with timed("analytics.refresh"):
+            for schema in partitions:
+                chunks.extend(self.read_chunks(conn, schema, condition, params))
+
+        if chunks:
+            self.sessions = np.concatenate([self.sessions] + chunks)
+            self.last_id = int(self.sessions["id"].max())
+        return sum(len(chunk) for chunk in chunks)
+
+    def read_chunks(self, conn, schema, condition, params):
+        """Leer las sesiones de un esquema en bloques de arrays"""
+        cursor = conn.execute(f"""
+        SELECT id, user_id,
+               COALESCE(start_epoch, CAST(strftime('%s', start_time, 'utc') AS INTEGER)),
+               CAST(julianday(COALESCE(local_day, substr(start_time, 1, 10)))
+                    - 2440587.5 AS INTEGER),
+               CAST(substr(start_time, 12, 2) AS INTEGER),
+               duration, exercise_id, completed
+        FROM {schema}.exercise_sessions
+        WHERE {condition}
+        ORDER BY id
+        """, params)
+
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            chunk = np.empty(len(rows), dtype=SESSION_DTYPE)
+            for name, column in zip(("id", "user", "epoch", "day", "hour", "duration"),
+                                    zip(*rows)):
+                chunk[name] = column
+            chunk["code"] = [self.exercise_code(row[6]) for row in rows]
+            chunk["completed"] = [bool(row[7]) for row in rows]
+            chunks.append(chunk)
+        return chunks
+
+    def select(self, start_day=None, end_day=None, completed_only=False):
+        """Filtrar sesiones por rango de días (fechas incluidas)"""
+        sessions = self.sessions
+        mask = np.ones(len(sessions), dtype=bool)
+        if start_day is not None:
+            mask &= sessions["day"] >= _day_number(start_day)
+        if end_day is not None:
+            mask &= sessions["day"] <= _day_number(end_day)
+        if completed_only:
+            mask &= sessions["completed"]
+        return sessions[mask]
+
+    def group_by(self, keys, sessions):
+        """Agrupar sesiones por una clave entera
+
+        Devuelve (claves, sesiones, completadas, tiempo_total) ordenado por clave.
+        """
+        unique, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique))
+        completed = np.bincount(inverse, weights=sessions["completed"], minlength=len(unique))
+        total_time = np.bincount(
+            inverse,
+            weights=np.where(sessions["completed"], sessions["duration"], 0),
+            minlength=len(unique)
+        )
+        return unique, counts, completed.astype(np.int64), total_time.astype(np.int64)
+
+    def by_day(self, start_day=None, end_day=None):
+        """Totales por día; las claves son numpy.datetime64[D]"""
+        sessions = self.select(start_day, end_day)
+        days, counts, completed, total_time = self.group_by(sessions["day"], sessions)
+        return days.astype("datetime64[D]"), counts, completed, total_time
+
+    def by_week(self, start_day=None, end_day=None):
+        """Totales por semana; las claves son el lunes de cada semana"""
+        sessions = self.select(start_day, end_day)
+        # El 1970-01-01 fue jueves: desplazar para que las semanas empiecen en lunes
+        mondays = sessions["day"] - (sessions["day"] + 3) % 7
+        weeks, counts, completed, total_time = self.group_by(mondays, sessions)
+        return weeks.astype("datetime64[D]"), counts, completed, total_time
+
+    def by_hour(self, start_day=None, end_day=None):
+        """Sesiones por hora del día (arrays de 24 posiciones)"""
+        sessions = self.select(start_day, end_day)
+        hours = sessions["hour"].astype(np.int64)
+        counts = np.bincount(hours, minlength=24)
+        completed = np.bincount(hours, weights=sessions["completed"], minlength=24)
+        return np.arange(24), counts, completed.astype(np.int64)
+
+    def per_exercise(self, start_day=None, end_day=None):
+        """Totales por ejercicio como diccionario exercise_id -> totales"""
+        sessions = self.select(start_day, end_day)
+        codes, counts, completed, total_time = self.group_by(sessions["code"], sessions)
+        return {
+            self.exercise_ids[code]: {
+                "sessions": int(count),
+                "exercises_completed": int(done),
+                "total_time": int(time)
+            }
+            for code, count, done, time in zip(codes, counts, completed, total_time)
+        }
+
+    def completion_rate(self, start_day=None, end_day=None):
+        """Proporción de sesiones completadas en el rango"""
+        sessions = self.select(start_day, end_day)
+        if len(sessions) == 0:
+            return 0.0
+        return float(sessions["completed"].mean())
+
+
+def _day_number(day):
+    """Convertir una fecha (date o 'YYYY-MM-DD') en días desde 1970-01-01"""
+    return int(np.datetime64(str(day), "D").astype(np.int64))
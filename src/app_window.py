@@ -27,7 +27,10 @@ from PyQt5.QtGui import (
     QIcon, QPixmap, QImage, QPainter, QTextDocument, QFont, QColor
 )
 from PyQt5.QtPrintSupport import QPrinter
-from PyQt5.QtChart import QChart, QChartView, QLineSeries
+from PyQt5.QtChart import (
+    QChart, QChartView, QLineSeries, QBarSeries, QBarSet, QBarCategoryAxis,
+    QValueAxis, QDateTimeAxis
+)
 
 
 
@@ -41,7 +44,10 @@ from health_integration import HealthIntegration
 from cloud_sync import CloudSync
 from report_generator import ReportGenerator
 from achievements import AchievementSystem
-from utils import load_config, save_config
+from analytics import SessionAnalytics
+from archiver import start_archiver
+from utils import load_config, save_config, parse_weights
+from storage import close_all_connections
 
 
 class MainWindow(QMainWindow):
@@ -52,15 +58,25 @@ class MainWindow(QMainWindow):
         self.config = config
         
         # Inicializar módulos principales
-        self.exercise_manager = ExerciseManager()
-        self.stats_tracker = StatsTracker()
+        self.exercise_manager = ExerciseManager(
+            parse_weights(config.get("DEFAULT", "difficulty_weights", fallback=""))
+        )
+        self.stats_tracker = StatsTracker(
+            write_behind=config.getboolean("DEFAULT", "write_behind", fallback=True),
+            user_id=config.getint("DEFAULT", "user_id", fallback=1)
+        )
         self.notification_manager = NotificationManager(config)
         self.calendar_integration = CalendarIntegration(config)
         self.health_integration = HealthIntegration(config)
         self.posture_analyzer = self.PostureAnalyzerStub()
         #self.posture_analyzer = self.create_posture_analyzer()  # Cambiado esta línea
         self.cloud_sync = CloudSync(config)
-        self.report_generator = ReportGenerator()
+        self.report_generator = ReportGenerator(self.stats_tracker.user_id)
+        self.analytics = SessionAnalytics(self.stats_tracker.db_path, self.stats_tracker.user_id)
+        start_archiver(
+            self.stats_tracker.db_path,
+            config.getint("DEFAULT", "archive_after_days", fallback=365)
+        )
         self.achievement_system = AchievementSystem()
         self.scheduler = ExerciseScheduler(config)
         
@@ -325,6 +341,14 @@ class MainWindow(QMainWindow):
         self.scheduler.stop()
         self.posture_analyzer.stop()
         self.cloud_sync.stop_auto_sync()
+        self.stats_tracker.close()
+        self.exercise_manager.save_state()
+        try:
+            self.analytics.refresh()
+            self.analytics.save_snapshot()
+        except OSError as e:
+            print(f"Error saving analytics snapshot: {e}")
+        close_all_connections()
         QApplication.quit()
 
     def setup_home_page(self):
@@ -525,8 +549,16 @@ class MainWindow(QMainWindow):
         self.status_bar.showMessage("Listo")
     
     def show_exercise(self, exercise_id):
-        """Mostrar un ejercicio específico"""
-        exercise = self.exercise_manager.get_exercise(exercise_id)
+        """Mostrar un ejercicio específico
+        
+        "random" saca uno cualquiera y un tipo (como los que emite el
+        planificador) saca uno de ese tipo.
+        """
+        if exercise_id == "random":
+            exercise = self.exercise_manager.get_random_exercise()
+        else:
+            exercise = (self.exercise_manager.get_exercise(exercise_id) or
+                        self.exercise_manager.get_random_exercise(exercise_id))
         if not exercise:
             QMessageBox.warning(self, "Error", "Ejercicio no encontrado")
             return
@@ -537,7 +569,7 @@ class MainWindow(QMainWindow):
         self.exercise_title.setText(exercise['name'])
         
         # Cargar imagen
-        pixmap = QPixmap(f"assets/images/{exercise['image']}")
+        pixmap = QPixmap(self.exercise_manager.get_image_path(exercise))
         self.exercise_media.setPixmap(pixmap.scaled(400, 400, Qt.KeepAspectRatio))
         
         self.exercise_description.setText(exercise['description'])
@@ -624,12 +656,8 @@ class MainWindow(QMainWindow):
             )
             
             # Verificar logros
-            stats = {
-                'total_sessions': self.stats_tracker.get_lifetime_stats()['total_sessions'],
-                'current_streak': self.stats_tracker.get_current_streak(),
-                # ... otros datos para logros
-            }
-            self.achievement_system.check_achievements(1, stats)  # Asumiendo user_id=1
+            stats = self.stats_tracker.get_achievement_metrics()
+            self.achievement_system.check_achievements(self.stats_tracker.user_id, stats)
         
         # Mostrar notificación
         self.notification_manager.show_notification(
@@ -724,16 +752,19 @@ class MainWindow(QMainWindow):
         chart = QChart()
         chart.setTitle("Actividad diaria")
         
-        # Obtener datos
-        stats = self.stats_tracker.get_weekly_stats()
+        # Obtener datos desde el almacén columnar
+        self.stats_tracker.flush()
+        self.analytics.refresh()
+        start_day = datetime.now().date() - timedelta(days=7)
+        days, _, completed, _ = self.analytics.by_day(start_day=start_day)
         
-        # Crear series
+        # Crear series (eje X en milisegundos desde la época)
         series = QLineSeries()
         series.setName("Pausas completadas")
         
-        for day in stats:
-            date = datetime.strptime(day['date'], "%Y-%m-%d").date()
-            series.append(date.toJulianDay(), day['exercises_completed'])
+        day_msecs = days.astype("datetime64[ms]").astype(np.int64)
+        for msecs, count in zip(day_msecs.tolist(), completed.tolist()):
+            series.append(msecs, count)
         
         chart.addSeries(series)
         
@@ -749,6 +780,38 @@ class MainWindow(QMainWindow):
         chart.addAxis(axis_y, Qt.AlignLeft)
         series.attachAxis(axis_y)
         
+        return chart
+    
+    def create_weekly_chart(self):
+        """Crear gráfico de estadísticas semanales desde los agregados"""
+        chart = QChart()
+        chart.setTitle("Actividad semanal")
+        
+        # Obtener datos (lectura directa de weekly_rollup)
+        weeks = self.stats_tracker.get_weekly_totals()
+        
+        bar_set = QBarSet("Pausas completadas")
+        categories = []
+        for week in weeks:
+            bar_set.append(week['exercises_completed'])
+            categories.append(week['week'][5:])
+        
+        series = QBarSeries()
+        series.append(bar_set)
+        chart.addSeries(series)
+        
+        # Configurar ejes
+        axis_x = QBarCategoryAxis()
+        axis_x.append(categories)
+        axis_x.setTitleText("Semana")
+        chart.addAxis(axis_x, Qt.AlignBottom)
+        series.attachAxis(axis_x)
+        
+        axis_y = QValueAxis()
+        axis_y.setTitleText("Pausas")
+        chart.addAxis(axis_y, Qt.AlignLeft)
+        series.attachAxis(axis_y)
+        
         return chart
     def setup_posture_ui(self):
         """Configurar la interfaz del monitor de postura simplificado"""
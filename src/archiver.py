@@ -0,0 +1,189 @@
+# src/archiver.py
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from storage import get_connection, transaction, timed, close_thread_connections
+from query_cache import bump_generation
+
+# SQLite permite 10 bases adjuntas por defecto; se deja margen
+MAX_ATTACHED_ARCHIVES = 8
+
+SESSION_COLUMNS = (
+    "id, user_id, exercise_id, start_time, start_epoch, local_day, duration, completed"
+)
+
+
+def create_archive_index(cursor):
+    """Crear el índice de particiones archivadas en la base de datos activa"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS session_archives (
+        month TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        first_epoch INTEGER NOT NULL,
+        last_epoch INTEGER NOT NULL,
+        sessions INTEGER NOT NULL
+    )
+    """)
+
+
+def archive_dir(db_path):
+    """Carpeta de las particiones mensuales de una base de datos"""
+    return Path(db_path).parent / "archive"
+
+
+def archive_schema(month):
+    """Nombre de esquema con el que se adjunta la partición de un mes"""
+    return "arc_" + month.replace("-", "_")
+
+
+def next_month(month):
+    """Mes siguiente a 'YYYY-MM'"""
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def attach_month(conn, month, path):
+    """Adjuntar la partición de un mes (si no lo está) y devolver su esquema"""
+    schema = archive_schema(month)
+    attached = [row[1] for row in conn.execute("PRAGMA database_list")]
+    if schema in attached:
+        return schema
+
+    archives = [name for name in attached if name.startswith("arc_")]
+    if len(archives) >= MAX_ATTACHED_ARCHIVES:
+        for name in archives:
+            conn.execute(f"DETACH DATABASE {name}")
+
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(path),))
+    return schema
+
+
+def iter_partitions(conn, start_epoch=None, end_epoch=None):
+    """Recorrer los esquemas con sesiones en un rango de épocas
+
+    Devuelve primero las particiones archivadas que solapan el rango, en
+    orden cronológico y adjuntadas bajo demanda, y al final "main". Los
+    meses archivados son anteriores a todo lo que queda en la base activa.
+    No se puede usar dentro de una transacción abierta (ATTACH no lo permite).
+    """
+    rows = conn.execute("""
+    SELECT month, path FROM session_archives
+    WHERE last_epoch >= ? AND first_epoch < ?
+    ORDER BY month
+    """, (
+        start_epoch if start_epoch is not None else -2 ** 62,
+        end_epoch if end_epoch is not None else 2 ** 62
+    )).fetchall()
+
+    for month, path in rows:
+        yield attach_month(conn, month, path)
+    yield "main"
+
+
+def archive_sessions(db_path, horizon_days=365, vacuum=False):
+    """Mover a particiones mensuales las sesiones más antiguas que el horizonte
+
+    Solo se archivan meses completos anteriores al horizonte. Cada mes se
+    copia (idempotente gracias a la clave primaria) y después se borra de la
+    base activa; los agregados, rachas y daily_stats no se tocan.
+    Las páginas liberadas se devuelven con incremental_vacuum si la base
+    usa auto_vacuum incremental, y si no las reutilizan las sesiones nuevas.
+    El VACUUM completo reescribe toda la base, así que solo se hace si se
+    pide con vacuum. Devuelve el número de sesiones archivadas.
+    """
+    conn = get_connection(db_path)
+    cutoff = date.today() - timedelta(days=horizon_days)
+    cutoff_month = cutoff.strftime("%Y-%m")
+
+    months = [row[0] for row in conn.execute("""
+    SELECT DISTINCT substr(local_day, 1, 7) FROM exercise_sessions
+    WHERE local_day < ?
+    ORDER BY 1
+    """, (f"{cutoff_month}-01",))]
+
+    folder = archive_dir(db_path)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    archived = 0
+    for month in months:
+        path = folder / f"sessions_{month.replace('-', '_')}.db"
+        schema = attach_month(conn, month, path)
+        bounds = (f"{month}-01", f"{next_month(month)}-01")
+
+        with timed("archiver.archive_month"):
+            with transaction(db_path) as cursor:
+                cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {schema}.exercise_sessions (
+                    id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    exercise_id TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    start_epoch INTEGER NOT NULL,
+                    local_day TEXT NOT NULL,
+                    duration INTEGER NOT NULL,
+                    completed BOOLEAN NOT NULL,
+                    PRIMARY KEY (user_id, start_epoch, id)
+                ) WITHOUT ROWID
+                """)
+                cursor.execute(f"""
+                INSERT OR IGNORE INTO {schema}.exercise_sessions ({SESSION_COLUMNS})
+                SELECT {SESSION_COLUMNS} FROM main.exercise_sessions
+                WHERE local_day >= ? AND local_day < ?
+                """, bounds)
+
+            with transaction(db_path) as cursor:
+                cursor.execute("""
+                DELETE FROM main.exercise_sessions
+                WHERE local_day >= ? AND local_day < ?
+                """, bounds)
+                archived += cursor.rowcount
+
+                cursor.execute(f"""
+                SELECT MIN(start_epoch), MAX(start_epoch), COUNT(*)
+                FROM {schema}.exercise_sessions
+                """)
+                first_epoch, last_epoch, sessions = cursor.fetchone()
+                cursor.execute("""
+                INSERT OR REPLACE INTO session_archives
+                    (month, path, first_epoch, last_epoch, sessions)
+                VALUES (?, ?, ?, ?, ?)
+                """, (month, str(path), first_epoch, last_epoch, sessions))
+                bump_generation(cursor)
+        conn.execute(f"DETACH DATABASE {schema}")
+
+    if archived:
+        if vacuum:
+            with timed("archiver.vacuum"):
+                conn.execute("VACUUM")
+        elif conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:  # INCREMENTAL
+            with timed("archiver.incremental_vacuum"):
+                # executescript avanza el pragma hasta el final; execute solo
+                # libera una página
+                conn.executescript("PRAGMA incremental_vacuum;")
+    return archived
+
+
+def start_archiver(db_path, horizon_days=365):
+    """Archivar sesiones antiguas en un hilo en segundo plano"""
+    def run():
+        try:
+            archived = archive_sessions(db_path, horizon_days)
+            if archived:
+                print(f"{archived} sesiones archivadas ({datetime.now():%Y-%m-%d %H:%M})")
+        except Exception as e:
+            print(f"Error archiving sessions: {e}")
+        finally:
+            close_thread_connections()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    import sys
+    # Uso: python archiver.py [ruta] [días] [--vacuum]
+    args = [arg for arg in sys.argv[1:] if arg != "--vacuum"]
+    db_path = args[0] if args else "database/stats.db"
+    horizon = int(args[1]) if len(args) > 1 else 365
+    print(f"{archive_sessions(db_path, horizon, '--vacuum' in sys.argv)} sesiones archivadas.")
@@ -0,0 +1,155 @@
+# src/batch_reports.py
+"""Generación en lote de reportes diarios en PDF
+
+Uso: python batch_reports.py --start 2024-05-01 --end 2024-05-31
+                             [--users 1,2,3] [--workers 4] [--output carpeta] [--db ruta]
+
+Los datos de todos los reportes se leen una sola vez en el proceso
+principal y se comparten con un grupo de procesos que solo renderizan.
+"""
+import os
+
+# Los procesos de renderizado no tienen pantalla
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, timedelta
+from pathlib import Path
+from storage import get_connection, timed
+from report_generator import ReportGenerator
+
+# Datos compartidos y generador de cada proceso de renderizado
+_snapshot = None
+_reports = None
+_app = None
+
+
+def load_snapshot(db_path, user_ids, start_date, end_date):
+    """Leer estadísticas y ejercicios de cada usuario y día del rango
+
+    Devuelve {usuario: {"YYYY-MM-DD": (estadísticas, ejercicios)}}.
+    """
+    reports = ReportGenerator(db_path=db_path)
+    start, end = reports.date_bounds(start_date, end_date)
+    conn = get_connection(db_path)
+    names = reports.get_exercise_names()
+
+    snapshot = {user_id: {} for user_id in user_ids}
+    with timed("batch_reports.load_snapshot"):
+        for user_id in user_ids:
+            days = snapshot[user_id]
+            for day, completed, total_time in conn.execute("""
+            SELECT date, exercises_completed, total_time
+            FROM daily_stats
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            """, (user_id, start_date.isoformat(), end_date.isoformat())):
+                days[day] = ({"exercises_completed": completed, "total_time": total_time}, [])
+
+            reports.user_id = user_id
+            for start_time, exercise_id, duration in reports.iter_sessions(conn, """
+            SELECT es.start_time, es.exercise_id, es.duration
+            FROM {sessions} es
+            WHERE {range}
+            ORDER BY es.start_epoch
+            """, start, end):
+                day = days.setdefault(start_time[:10], ({}, []))
+                day[1].append({"time": start_time[11:16],
+                               "name": names.get(exercise_id, exercise_id), "duration": duration})
+    return snapshot
+
+
+def init_worker(snapshot):
+    """Preparar un proceso de renderizado con Qt sin pantalla"""
+    global _snapshot, _reports, _app
+    from PyQt5.QtWidgets import QApplication
+    _app = QApplication.instance() or QApplication(["batch_reports"])
+    _snapshot = snapshot
+    _reports = ReportGenerator()
+
+
+def render_report(user_id, day, output_dir):
+    """Renderizar el reporte de un usuario y día; devuelve la ruta"""
+    stats, exercises = _snapshot[user_id].get(day.isoformat(), ({}, []))
+    folder = Path(output_dir) / f"usuario_{user_id}"
+    folder.mkdir(parents=True, exist_ok=True)
+    report_path = folder / f"reporte_{day.strftime('%Y%m%d')}.pdf"
+    _reports.render_daily_report(day, stats, exercises, report_path)
+    return str(report_path)
+
+
+def generate_batch(db_path, user_ids, start_date, end_date, output_dir, workers=None):
+    """Generar los reportes diarios de varios usuarios en paralelo
+
+    Como mucho hay dos tareas por proceso en vuelo. Devuelve
+    (generados, [(usuario, día, error)]).
+    """
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    snapshot = load_snapshot(db_path, user_ids, start_date, end_date)
+    tasks = [
+        (user_id, start_date + timedelta(days=offset))
+        for user_id in user_ids
+        for offset in range((end_date - start_date).days + 1)
+    ]
+
+    generated = 0
+    failures = []
+    context = multiprocessing.get_context("spawn")  # Qt no tolera fork
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=(snapshot,)) as pool:
+        pending = {}
+        task_iter = iter(tasks)
+        while True:
+            for user_id, day in task_iter:
+                future = pool.submit(render_report, user_id, day, output_dir)
+                pending[future] = (user_id, day)
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                user_id, day = pending.pop(future)
+                try:
+                    future.result()
+                    generated += 1
+                except Exception as e:
+                    failures.append((user_id, day, e))
+    return generated, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar reportes diarios en lote")
+    parser.add_argument("--start", required=True, type=date.fromisoformat)
+    parser.add_argument("--end", required=True, type=date.fromisoformat)
+    parser.add_argument("--users", help="Usuarios separados por comas (por defecto, todos)")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", default=str(Path.home() / ".pausas_activas" / "reports" / "lote"))
+    parser.add_argument("--db", default="database/stats.db")
+    args = parser.parse_args()
+
+    if args.users:
+        user_ids = [int(user_id) for user_id in args.users.split(",")]
+    else:
+        user_ids = [row[0] for row in get_connection(args.db).execute("""
+        SELECT DISTINCT user_id FROM daily_stats WHERE date BETWEEN ? AND ? ORDER BY user_id
+        """, (args.start.isoformat(), args.end.isoformat()))]
+
+    start = time.perf_counter()
+    generated, failures = generate_batch(
+        args.db, user_ids, args.start, args.end, args.output, args.workers
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"{generated} reportes de {len(user_ids)} usuarios en {elapsed:.1f} s "
+          f"({generated / elapsed:.1f} reportes/s), {len(failures)} fallidos")
+    for user_id, day, error in failures[:10]:
+        print(f"  usuario {user_id}, {day}: {error}")
+    print(f"Reportes en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# src/benchmark_catalog.py
+"""Búsquedas en el catálogo de ejercicios frente a recorrer la lista
+
+Uso: python benchmark_catalog.py [--sizes 10,100,1000,10000] [--lookups 20000]
+                                  [--search-size 20000]
+
+Compara, para catálogos sintéticos de varios tamaños, las búsquedas por id,
+por tipo y al azar del ExerciseCatalog con los recorridos lineales que
+hacían antes ExerciseManager y CustomExerciseManager. Después mide la
+búsqueda de texto de ExerciseStore sobre un catálogo grande.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from exercise_catalog import ExerciseCatalog
+from exercise_store import ExerciseStore
+
+TYPES = ("stretch", "strength", "breathing", "posture", "eyes", "mobility")
+DIFFICULTIES = ("fácil", "media", "difícil")
+WORDS = ("cuello", "hombros", "espalda", "muñecas", "ojos", "respiración", "postura",
+         "rotación", "inclinación", "lenta", "profunda", "sentado", "pie", "brazos")
+SEARCHES = ("cuello", "hombros lenta", "respira", "rotacion", "ojos sentado", "espalda pie")
+
+
+def make_exercises(count, rng):
+    """Generar ejercicios sintéticos repartidos entre los tipos"""
+    return [
+        {
+            "id": f"exercise_{i}",
+            "name": f"Ejercicio {i}",
+            "description": " ".join(rng.choice(WORDS) for _ in range(8)),
+            "type": rng.choice(TYPES),
+            "duration": rng.choice((30, 45, 60)),
+            "difficulty": rng.choice(DIFFICULTIES)
+        }
+        for i in range(count)
+    ]
+
+
+def scan_get(exercises, exercise_id):
+    """Búsqueda por id anterior: recorrer la lista"""
+    for exercise in exercises:
+        if exercise["id"] == exercise_id:
+            return exercise
+    return None
+
+
+def scan_random(exercises, exercise_type, rng):
+    """Elección al azar anterior: filtrar la lista por tipo"""
+    candidates = [ex for ex in exercises if ex["type"] == exercise_type]
+    return rng.choice(candidates) if candidates else None
+
+
+def per_call_us(func, keys):
+    """Microsegundos por llamada de func sobre cada clave"""
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    return (time.perf_counter() - start) * 1e6 / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsquedas en el catálogo de ejercicios")
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--search-size", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'ejercicios':>11}{'operación':>12}{'µs antes':>11}{'µs ahora':>11}{'veces':>9}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        exercises = make_exercises(size, rng)
+        catalog = ExerciseCatalog(exercises)
+        ids = [f"exercise_{rng.randrange(size)}" for _ in range(args.lookups)]
+        # Las búsquedas por tipo recorren la lista entera: menos repeticiones
+        types = [rng.choice(TYPES) for _ in range(max(100, args.lookups // max(1, size // 100)))]
+
+        cases = (
+            ("id", ids,
+             lambda key: scan_get(exercises, key), catalog.get),
+            ("tipo", types,
+             lambda key: [ex for ex in exercises if ex["type"] == key], catalog.by_type),
+            ("azar", types,
+             lambda key: scan_random(exercises, key, rng), lambda key: catalog.random(key, rng))
+        )
+        for name, keys, old, new in cases:
+            old_us = per_call_us(old, keys)
+            new_us = per_call_us(new, keys)
+            print(f"{size:>11}{name:>12}{old_us:>11.2f}{new_us:>11.2f}{old_us / new_us:>9.1f}")
+
+    folder = Path(tempfile.mkdtemp(prefix="pausas_catalog_"))
+    json_path = folder / "exercises.json"
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(make_exercises(args.search_size, rng), f, ensure_ascii=False)
+    store = ExerciseStore(str(folder / "exercises.db"))
+    start = time.perf_counter()
+    store.sync_json(json_path)
+    print(f"\nVolcado de {args.search_size} ejercicios: {(time.perf_counter() - start) * 1000:.0f} ms")
+    start = time.perf_counter()
+    store.sync_json(json_path)
+    print(f"Sincronización sin cambios en el JSON: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    print(f"{'búsqueda':>16}{'filtro':>10}{'resultados':>12}{'ms':>8}")
+    for text in SEARCHES:
+        for exercise_type in (None, "eyes"):
+            start = time.perf_counter()
+            results = store.search(text, exercise_type, limit=50)
+            ms = (time.perf_counter() - start) * 1000
+            print(f"{text:>16}{exercise_type or '-':>10}{len(results):>12}{ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# src/benchmark_memory.py
+"""Memoria por ejercicio: diccionarios frente a ExerciseRecord
+
+Uso: python benchmark_memory.py [--exercises 20000]
+
+Carga el mismo catálogo sintético (ya en JSON) como lista de diccionarios y
+como lista de ExerciseRecord, y mide con tracemalloc lo que queda reservado
+en cada caso. Los textos propios de cada ejercicio (nombre, descripción)
+cuestan lo mismo en ambos; la diferencia está en el contenedor y en los
+tipos y dificultades internados.
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from benchmark_catalog import make_exercises
+from exercise_record import ExerciseRecord
+
+
+def retained_bytes(load):
+    """Bytes que siguen reservados tras ejecutar load (y su resultado)"""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria de los ejercicios en memoria")
+    parser.add_argument("--exercises", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    data = json.dumps(make_exercises(args.exercises, random.Random(args.seed)), ensure_ascii=False)
+
+    dict_bytes, dicts = retained_bytes(lambda: json.loads(data))
+    record_bytes, records = retained_bytes(
+        lambda: [ExerciseRecord.from_dict(exercise) for exercise in json.loads(data)])
+
+    count = args.exercises
+    print(f"{count} ejercicios")
+    print(f"{'':<18}{'total KiB':>12}{'bytes/ejercicio':>18}{'contenedor':>12}")
+    print(f"{'dict':<18}{dict_bytes / 1024:>12.0f}{dict_bytes / count:>18.0f}"
+          f"{sys.getsizeof(dicts[0]):>12}")
+    print(f"{'ExerciseRecord':<18}{record_bytes / 1024:>12.0f}{record_bytes / count:>18.0f}"
+          f"{sys.getsizeof(records[0]):>12}")
+    print(f"Ahorro: {(dict_bytes - record_bytes) / count:.0f} bytes por ejercicio "
+          f"({1 - record_bytes / dict_bytes:.0%})")
+
+    if [dict(record) for record in records] != dicts:
+        raise SystemExit("Los registros no equivalen a los diccionarios")
+
+
+if __name__ == "__main__":
+    main()
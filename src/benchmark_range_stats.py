@@ -0,0 +1,100 @@
+# src/benchmark_range_stats.py
+"""Escalado de ReportGenerator.get_range_stats con la longitud del rango
+
+Uso: python benchmark_range_stats.py [--years 3] [--repeat 5] [--db ruta]
+
+Compara la consulta por conjuntos con la versión anterior (una consulta de
+ejercicios por día) y muestra sentencias SQL y tiempo por rango.
+"""
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from storage import get_connection
+from synthetic_history import generate_history
+from report_generator import ReportGenerator
+
+RANGE_DAYS = (7, 30, 90, 365, 730, 1095)
+
+
+def per_day_range_stats(reports, start_date, end_date):
+    """Versión anterior de get_range_stats: una consulta por día, como referencia"""
+    conn = get_connection(reports.db_path)
+    stats = [
+        {"date": row[0], "exercises_completed": row[1], "total_time": row[2], "exercises": []}
+        for row in conn.execute("""
+        SELECT date, exercises_completed, total_time
+        FROM daily_stats
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+        ORDER BY date
+        """, (reports.user_id, start_date.isoformat(), end_date.isoformat()))
+    ]
+    names = reports.get_exercise_names()
+    for day in stats:
+        day_start = datetime.fromisoformat(day["date"])
+        rows = reports.query_sessions(conn, """
+        SELECT es.exercise_id
+        FROM {sessions} es
+        WHERE {range}
+        ORDER BY es.start_epoch
+        """, day_start, day_start + timedelta(days=1))
+        day["exercises"] = [names.get(row[0], row[0]) for row in rows]
+    return stats
+
+
+def run(func, conn, repeat):
+    """Ejecutar func varias veces; devuelve (sentencias, ms mediana, resultado)"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        result = func()
+    finally:
+        conn.set_trace_callback(None)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return len(statements), times[len(times) // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalado de get_range_stats")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--user", type=int, default=1)
+    parser.add_argument("--db", help="Base ya poblada a usar en lugar de generar una")
+    args = parser.parse_args()
+
+    db_path = args.db
+    if db_path is None:
+        db_path = str(Path(tempfile.mkdtemp(prefix="pausas_range_")) / "stats.db")
+        print(f"{generate_history(db_path, users=3, years=args.years)} sesiones generadas")
+
+    reports = ReportGenerator(args.user, db_path)
+    conn = get_connection(db_path)
+    today = date.today()
+
+    print(f"{'días':>6}{'filas':>8}{'sent. antes':>13}{'ms antes':>11}"
+          f"{'sent. ahora':>13}{'ms ahora':>11}")
+    for days in RANGE_DAYS:
+        start = today - timedelta(days=days - 1)
+        old_queries, old_ms, old = run(
+            lambda: per_day_range_stats(reports, start, today), conn, args.repeat)
+        new_queries, new_ms, new = run(
+            lambda: reports.get_range_stats(start, today), conn, args.repeat)
+        if old != new:
+            raise SystemExit(f"Resultados distintos para {days} días")
+        print(f"{days:>6}{len(new):>8}{old_queries:>13}{old_ms:>11.2f}"
+              f"{new_queries:>13}{new_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
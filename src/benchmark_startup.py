@@ -0,0 +1,125 @@
+# src/benchmark_startup.py
+"""Tiempo hasta tener un catálogo de ejercicios utilizable al arrancar
+
+Uso: python benchmark_startup.py [--exercises 5000] [--runs 5]
+                                 [--output startup_results.json]
+
+Mide, en procesos nuevos, cuánto tarda ExerciseManager en tener el catálogo
+listo en el primer arranque, sin snapshot (desde el JSON) y con el
+snapshot al día; y, dentro de este proceso, cada forma de leer el catálogo.
+"""
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from benchmark_catalog import make_exercises
+from catalog_snapshot import load_json_catalog, snapshot_path
+from exercise_catalog import ExerciseCatalog
+from exercise_store import ExerciseStore
+
+# Se ejecuta en un proceso nuevo con la carpeta de trabajo como directorio actual
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from exercise_manager import ExerciseManager
+manager = ExerciseManager(db_path="exercises.db")
+assert len(manager.catalog)
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def median_ms(func, runs):
+    """Mediana en ms de varias ejecuciones de func"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def startup_ms(work_dir):
+    """Tiempo de importar y construir ExerciseManager en un proceso nuevo"""
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join(filter(None, [str(Path(__file__).parent),
+                                                        os.environ.get("PYTHONPATH")])))
+    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=work_dir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranque del catálogo de ejercicios")
+    parser.add_argument("--exercises", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="startup_results.json")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="pausas_startup_"))
+    # Los snapshots y el estado del usuario van a la carpeta de trabajo, aquí
+    # y en los procesos de startup_ms, que heredan el entorno
+    os.environ["HOME"] = str(work_dir)
+    json_path = work_dir / "assets" / "data" / "exercises.json"
+    json_path.parent.mkdir(parents=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(make_exercises(args.exercises, random.Random(args.seed)), f, ensure_ascii=False)
+
+    # Arranque completo en procesos nuevos
+    results = {"process": {}, "in_process": {}}
+    results["process"]["primer arranque"] = startup_ms(work_dir)
+    process_runs = {"sin snapshot": [], "con snapshot": []}
+    for _ in range(args.runs):
+        snapshot_path(json_path).unlink()
+        process_runs["sin snapshot"].append(startup_ms(work_dir))
+        process_runs["con snapshot"].append(startup_ms(work_dir))
+    for name, times in process_runs.items():
+        results["process"][name] = sorted(times)[len(times) // 2]
+
+    # Cada forma de leer el catálogo, ya con los módulos importados
+    store = ExerciseStore(str(work_dir / "exercises.db"))
+
+    def from_json():
+        with open(json_path, "r", encoding="utf-8") as f:
+            return ExerciseCatalog(json.load(f))
+
+    def from_db():
+        store.sync_json(json_path)
+        return ExerciseCatalog(store.load(custom=False))
+
+    def from_snapshot():
+        store.sync_json(json_path)
+        return ExerciseCatalog(load_json_catalog(json_path))
+
+    for name, func in (("json", from_json), ("exercises.db", from_db), ("snapshot", from_snapshot)):
+        results["in_process"][name] = median_ms(func, args.runs)
+
+    print(f"{args.exercises} ejercicios, mediana de {args.runs} ejecuciones")
+    for group, title in (("process", "ExerciseManager en un proceso nuevo"),
+                         ("in_process", "Lectura del catálogo")):
+        print(title)
+        for name, ms in results[group].items():
+            print(f"  {name:<20}{ms:>10.1f} ms")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "parameters": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
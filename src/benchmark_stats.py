@@ -0,0 +1,198 @@
+# src/benchmark_stats.py
+"""Banco de pruebas de las rutas de lectura y escritura de estadísticas
+
+Uso: python benchmark_stats.py [--users 50] [--years 3] [--samples 200]
+                               [--output resultados.json] [--compare anterior.json]
+
+Genera un historial sintético reproducible en una carpeta temporal (o usa
+--db), mide cada operación y guarda percentiles de latencia y filas por
+segundo en JSON. No necesita pantalla.
+"""
+import os
+
+# Sin pantalla: Qt debe elegir la plataforma antes de importarse
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from storage import get_connection
+from synthetic_history import generate_history, EXERCISE_CATALOG
+from stats_tracker import StatsTracker
+from report_generator import ReportGenerator
+from achievements import AchievementSystem
+from analytics import SessionAnalytics
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, p):
+    """Percentil por rango más cercano de una lista ordenada"""
+    index = max(0, min(len(values) - 1, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize_latencies(latencies, rows=0):
+    """Resumir latencias en milisegundos y filas por segundo"""
+    values = sorted(latencies)
+    total = sum(values)
+    summary = {f"p{p}_ms": round(percentile(values, p), 4) for p in PERCENTILES}
+    summary["mean_ms"] = round(total / len(values), 4)
+    summary["max_ms"] = round(values[-1], 4)
+    summary["samples"] = len(values)
+    if rows:
+        summary["rows_per_s"] = round(rows / (total / 1000), 1) if total else None
+    return summary
+
+
+def measure(func, samples, prepare=None, counts_rows=False):
+    """Medir una operación; si counts_rows, func devuelve las filas procesadas"""
+    latencies = []
+    rows = 0
+    for i in range(samples):
+        if prepare is not None:
+            prepare(i)
+        start = time.perf_counter()
+        result = func()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if counts_rows:
+            rows += result
+    return latencies, rows
+
+
+def run_benchmarks(db_path, work_dir, users, samples, seed=7):
+    """Medir las rutas principales sobre una base ya poblada"""
+    rng = random.Random(seed)
+    tracker = StatsTracker(db_path=db_path)
+    tracker.backfill_thread.join()
+    reports = ReportGenerator(db_path=db_path)
+    achievements = AchievementSystem(str(Path(work_dir) / "achievements.db"))
+    today = date.today()
+
+    def pick_user(i):
+        # Cada muestra usa otro usuario y la caché vacía: se mide la base de datos
+        tracker.user_id = reports.user_id = rng.randint(1, users)
+        tracker.query_cache.clear()
+
+    def range_stats(days):
+        def run():
+            return len(reports.get_range_stats(today - timedelta(days=days - 1), today))
+        return run
+
+    def check_achievements():
+        return achievements.check_achievements(tracker.user_id, tracker.get_achievement_metrics())
+
+    def log_exercise():
+        tracker.log_exercise(rng.choice(EXERCISE_CATALOG)[0], 30)
+        return 1
+
+    def cold_analytics():
+        analytics = SessionAnalytics(db_path, user_id=tracker.user_id)
+        return len(analytics.sessions)
+
+    # Nombre -> (operación, preparación de cada muestra, ¿devuelve filas?)
+    benchmarks = {
+        "stats.get_today_stats": (tracker.get_today_stats, pick_user, False),
+        "stats.get_weekly_stats": (tracker.get_weekly_stats, pick_user, False),
+        "stats.get_weekly_totals": (tracker.get_weekly_totals, pick_user, False),
+        "stats.get_monthly_totals": (tracker.get_monthly_totals, pick_user, False),
+        "stats.get_exercise_breakdown": (tracker.get_exercise_breakdown, pick_user, False),
+        "stats.get_lifetime_stats": (tracker.get_lifetime_stats, pick_user, False),
+        "stats.get_today_stats_cached": (tracker.get_today_stats, None, False),
+        "reports.get_range_stats_30d": (range_stats(30), pick_user, True),
+        "reports.get_range_stats_365d": (range_stats(365), pick_user, True),
+        "achievements.check_achievements": (check_achievements, pick_user, False),
+        "analytics.cold_load_user": (cold_analytics, pick_user, True),
+        "stats.log_exercise": (log_exercise, pick_user, True),
+    }
+
+    results = {}
+    for name, (func, prepare, counts_rows) in benchmarks.items():
+        latencies, rows = measure(func, samples, prepare, counts_rows)
+        results[name] = summarize_latencies(latencies, rows)
+        print_result(name, results[name])
+
+    tracker.close()
+    return results
+
+
+def print_result(name, result):
+    """Imprimir una línea de resultados"""
+    rows = result.get("rows_per_s")
+    print(f"{name:<36}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+          f"{result['p99_ms']:>10.3f}{result['max_ms']:>10.3f}"
+          f"{rows if rows is not None else '':>14}")
+
+
+def compare(results, previous_path):
+    """Comparar la mediana con la de una ejecución anterior"""
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)["results"]
+    print(f"\n{'operación':<36}{'p50 antes':>12}{'p50 ahora':>12}{'cambio':>10}")
+    for name, result in results.items():
+        before = previous.get(name)
+        if before is None or not before["p50_ms"]:
+            continue
+        change = (result["p50_ms"] / before["p50_ms"] - 1) * 100
+        print(f"{name:<36}{before['p50_ms']:>12.3f}{result['p50_ms']:>12.3f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas de stats.db")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="Base ya poblada a usar en lugar de generar una")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Resultados JSON anteriores con los que comparar")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="pausas_bench_")
+    setup = {}
+    if args.db:
+        db_path = args.db
+    else:
+        db_path = str(Path(work_dir) / "stats.db")
+        start = time.perf_counter()
+        inserted = generate_history(db_path, args.users, args.years, seed=args.seed)
+        elapsed = time.perf_counter() - start
+        setup = {"sessions": inserted, "seconds": round(elapsed, 2),
+                 "rows_per_s": round(inserted / elapsed, 1)}
+        print(f"{inserted} sesiones generadas en {elapsed:.1f} s "
+              f"({inserted / elapsed:.0f} filas/s)")
+
+    sessions = get_connection(db_path).execute("SELECT COUNT(*) FROM exercise_sessions").fetchone()[0]
+    users = args.users if not args.db else get_connection(db_path).execute(
+        "SELECT MAX(user_id) FROM exercise_sessions").fetchone()[0] or 1
+
+    print(f"{'operación':<36}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'filas/s':>14}")
+    results = run_benchmarks(db_path, work_dir, users, args.samples)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "parameters": {**vars(args), "sessions": sessions},
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "setup": setup,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# src/catalog_snapshot.py
+import hashlib
+import json
+import marshal
+import os
+from pathlib import Path
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".catalog"
+
+
+def snapshot_dir():
+    """Carpeta de los snapshots, en la carpeta del usuario"""
+    return Path.home() / ".pausas_activas" / "catalog_cache"
+
+
+def snapshot_path(source_path):
+    """Ruta del snapshot de un archivo JSON
+
+    Los snapshots no se guardan junto a los datos de la aplicación, que
+    pueden ser de solo lectura; el nombre lleva un hash de la ruta completa
+    para que dos JSON con el mismo nombre no compartan snapshot.
+    """
+    source_path = Path(source_path)
+    path_hash = hashlib.sha1(str(source_path.resolve()).encode("utf-8")).hexdigest()[:12]
+    return snapshot_dir() / f"{source_path.stem}-{path_hash}{SNAPSHOT_SUFFIX}"
+
+
+def file_digest(path):
+    """Hash sha256 del contenido de un archivo"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_snapshot(source_path):
+    """Cargar los ejercicios del snapshot si sigue al día con su JSON
+
+    Primero se comparan fecha de modificación y tamaño; si difieren pero el
+    contenido tiene el mismo hash, se actualiza la cabecera y se usa igual.
+    Devuelve None si no hay snapshot válido.
+    """
+    source_path = Path(source_path)
+    try:
+        # marshal.loads sobre los bytes: marshal.load lee el archivo a trozos
+        snapshot = marshal.loads(snapshot_path(source_path).read_bytes())
+        stat = source_path.stat()
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+
+    if (snapshot["mtime_ns"], snapshot["size"]) != (stat.st_mtime_ns, stat.st_size):
+        digest = file_digest(source_path)
+        if digest != snapshot["sha256"]:
+            return None
+        write_snapshot(source_path, snapshot["exercises"], digest, stat)
+    return snapshot["exercises"]
+
+
+def write_snapshot(source_path, exercises, digest=None, stat=None):
+    """Guardar el snapshot de los ejercicios leídos de un JSON
+
+    stat y digest deben corresponder al archivo que se leyó; si no se dan se
+    toman ahora. Un error al escribir no es grave: se vuelve al JSON.
+    """
+    source_path = Path(source_path)
+    path = snapshot_path(source_path)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        stat = stat or source_path.stat()
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest or file_digest(source_path),
+            "exercises": [dict(exercise) for exercise in exercises]  # Registros a dict
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_bytes(marshal.dumps(snapshot))
+        os.replace(tmp_path, path)
+        return True
+    except (OSError, ValueError) as e:
+        print(f"Error writing catalog snapshot: {e}")
+        if tmp_path.exists():
+            tmp_path.unlink()
+        return False
+
+
+def load_json_catalog(source_path):
+    """Cargar un JSON de ejercicios, desde su snapshot si está al día"""
+    exercises = load_snapshot(source_path)
+    if exercises is None:
+        source_path = Path(source_path)
+        stat = source_path.stat()
+        data = source_path.read_bytes()
+        exercises = json.loads(data.decode("utf-8"))
+        write_snapshot(source_path, exercises, hashlib.sha256(data).hexdigest(), stat)
+    return exercises
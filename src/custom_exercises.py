@@ -9,74 +9,124 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, pyqtSignal, QObject
 from PyQt5.QtGui import QIcon, QPixmap
+from exercise_catalog import ExerciseCatalog
+from catalog_snapshot import load_json_catalog, write_snapshot
 
 
 class CustomExerciseManager(QObject):
     exercises_updated = pyqtSignal()  # Señal emitida cuando los ejercicios cambian
     
-    def __init__(self):
+    def __init__(self, catalog=None, store=None):
         super().__init__()
         self.exercises_dir = Path.home() / ".pausas_activas" / "custom_exercises"
         self.exercises_dir.mkdir(parents=True, exist_ok=True)
         self.exercises_file = self.exercises_dir / "custom_exercises.json"
         self.images_dir = self.exercises_dir / "images"
         self.images_dir.mkdir(exist_ok=True)
+        # Con el catálogo de ExerciseManager los personalizados se mezclan con los incluidos
+        self.catalog = catalog if catalog is not None else ExerciseCatalog()
+        self.store = store  # ExerciseStore donde indexarlos para la búsqueda
+        self.custom_ids = {}  # Ids propios en orden de creación
         self.load_exercises()
     
+    @property
+    def exercises(self):
+        """Ejercicios personalizados en orden de creación"""
+        return [self.catalog.get(exercise_id) for exercise_id in self.custom_ids]
+    
     def load_exercises(self):
-        """Cargar ejercicios personalizados desde el archivo JSON"""
+        """Cargar ejercicios personalizados (del snapshot si el JSON no ha cambiado)"""
         try:
             if self.exercises_file.exists():
-                with open(self.exercises_file, 'r', encoding='utf-8') as f:
-                    self.exercises = json.load(f)
+                exercises = load_json_catalog(self.exercises_file)
             else:
-                self.exercises = []
+                exercises = []
         except (json.JSONDecodeError, Exception) as e:
             print(f"Error loading custom exercises: {e}")
-            self.exercises = []
+            exercises = []
+        
+        self.sync_store()
+        for exercise_id in self.custom_ids:
+            self.catalog.remove(exercise_id)
+        self.custom_ids = {}
+        for exercise in exercises:
+            if self.is_builtin(exercise['id']):
+                print(f"Ignoring custom exercise with a built-in id: {exercise['id']}")
+                continue
+            exercise['custom'] = True
+            self.catalog.add(exercise)
+            self.custom_ids[exercise['id']] = None
+    
+    def is_builtin(self, exercise_id):
+        """Si el id es de un ejercicio incluido del catálogo compartido"""
+        exercise = self.catalog.get(exercise_id)
+        return exercise is not None and not exercise.get('custom')
     
     def save_exercises(self):
         """Guardar ejercicios personalizados en el archivo JSON"""
         try:
             with open(self.exercises_file, 'w', encoding='utf-8') as f:
-                json.dump(self.exercises, f, ensure_ascii=False, indent=2)
+                json.dump([dict(ex) for ex in self.exercises], f, ensure_ascii=False, indent=2)
+            write_snapshot(self.exercises_file, self.exercises)
+            self.sync_store()
             self.exercises_updated.emit()
             return True
         except Exception as e:
             print(f"Error saving custom exercises: {e}")
             return False
     
+    def sync_store(self):
+        """Volcar el archivo a exercises.db si ha cambiado"""
+        if self.store is None or not self.exercises_file.exists():
+            return
+        try:
+            self.store.sync_json(self.exercises_file, custom=True)
+        except Exception as e:
+            print(f"Error indexing custom exercises: {e}")
+    
     def add_exercise(self, exercise_data):
-        """Añadir nuevo ejercicio personalizado"""
+        """Añadir nuevo ejercicio personalizado
+        
+        Un id que ya usa un ejercicio incluido se rechaza: lo sustituiría en
+        el catálogo y al borrar el personalizado desaparecería también.
+        """
+        if 'id' in exercise_data and self.is_builtin(exercise_data['id']):
+            print(f"Custom exercise id already used by a built-in exercise: {exercise_data['id']}")
+            return False
         # Asignar ID único si no viene con uno
         if 'id' not in exercise_data:
-            exercise_data['id'] = f"custom_{len(self.exercises) + 1}"
+            number = len(self.custom_ids) + 1
+            while f"custom_{number}" in self.catalog:
+                number += 1
+            exercise_data['id'] = f"custom_{number}"
         
         exercise_data['custom'] = True
-        self.exercises.append(exercise_data)
+        self.catalog.add(exercise_data)
+        self.custom_ids[exercise_data['id']] = None
         return self.save_exercises()
     
     def update_exercise(self, exercise_id, new_data):
         """Actualizar un ejercicio existente"""
-        for i, ex in enumerate(self.exercises):
-            if ex['id'] == exercise_id:
-                # Mantener el ID y marcar como custom
-                new_data['id'] = exercise_id
-                new_data['custom'] = True
-                self.exercises[i] = new_data
-                return self.save_exercises()
-        return False
+        if exercise_id not in self.custom_ids:
+            return False
+        # Mantener el ID y marcar como custom
+        new_data['id'] = exercise_id
+        new_data['custom'] = True
+        self.catalog.update(exercise_id, new_data)
+        return self.save_exercises()
     
     def delete_exercise(self, exercise_id):
         """Eliminar un ejercicio personalizado"""
-        self.exercises = [ex for ex in self.exercises if ex['id'] != exercise_id]
+        if exercise_id in self.custom_ids:
+            del self.custom_ids[exercise_id]
+            if not self.is_builtin(exercise_id):
+                self.catalog.remove(exercise_id)
         return self.save_exercises()
     
     def get_exercise(self, exercise_id):
         """Obtener un ejercicio por su ID"""
-        for ex in self.exercises:
-            if ex['id'] == exercise_id:
-                return ex
+        if exercise_id in self.custom_ids:
+            return self.catalog.get(exercise_id)
         return None
     
     def get_exercises(self):
@@ -85,7 +135,7 @@ class CustomExerciseManager(QObject):
     
     def get_exercises_by_type(self, exercise_type):
         """Obtener ejercicios filtrados por tipo"""
-        return [ex for ex in self.exercises if ex['type'] == exercise_type]
+        return [ex for ex in self.catalog.by_type(exercise_type) if ex['id'] in self.custom_ids]
     
     def import_image(self, source_path):
         """Importar una imagen al directorio de ejercicios"""
@@ -1,5 +1,7 @@
 import sqlite3
 from pathlib import Path
+from migrations import migrate_stats_db
+from exercise_store import create_exercise_tables
 
 def init_databases():
     """Inicializar todas las bases de datos necesarias"""
@@ -22,6 +24,10 @@ def init_stats_db(db_path):
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
+    # Solo tiene efecto en una base nueva: permite devolver al sistema las
+    # páginas que libera el archivado sin un VACUUM completo
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    
     # Tabla de sesiones de ejercicio
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS exercise_sessions (
@@ -43,24 +49,13 @@ def init_stats_db(db_path):
     )
     """)
     
-    # Tabla de estadísticas globales
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS lifetime_stats (
-        id INTEGER PRIMARY KEY DEFAULT 1,
-        total_sessions INTEGER NOT NULL DEFAULT 0,
-        total_time INTEGER NOT NULL DEFAULT 0,
-        longest_streak INTEGER NOT NULL DEFAULT 0
-    )
-    """)
-    
-    # Insertar registro inicial si no existe
-    cursor.execute("""
-    INSERT OR IGNORE INTO lifetime_stats (id, total_sessions, total_time, longest_streak)
-    VALUES (1, 0, 0, 0)
-    """)
+    # Las estadísticas globales por usuario (lifetime_stats) las crean las migraciones
     
     conn.commit()
     conn.close()
+    
+    # Aplicar migraciones de esquema
+    migrate_stats_db(db_path)
 
 def init_achievements_db(db_path):
     """Inicializar base de datos de logros"""
@@ -89,6 +84,17 @@ def init_achievements_db(db_path):
     )
     """)
     
+    # Tabla de progreso hacia logros bloqueados
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS achievement_progress (
+        user_id INTEGER NOT NULL,
+        achievement_id TEXT NOT NULL,
+        progress INTEGER NOT NULL,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (user_id, achievement_id)
+    ) WITHOUT ROWID
+    """)
+    
     # Insertar logros básicos
     cursor.execute("SELECT COUNT(*) FROM achievements")
     if cursor.fetchone()[0] == 0:
@@ -113,19 +119,7 @@ def init_exercises_db(db_path):
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS exercises (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        description TEXT NOT NULL,
-        type TEXT NOT NULL,
-        duration INTEGER NOT NULL,
-        difficulty TEXT NOT NULL,
-        image_path TEXT,
-        video_path TEXT,
-        custom BOOLEAN NOT NULL DEFAULT 0
-    )
-    """)
+    create_exercise_tables(cursor)
     
     # Insertar ejercicios básicos
     cursor.execute("SELECT COUNT(*) FROM exercises")
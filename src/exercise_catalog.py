@@ -0,0 +1,110 @@
+# src/exercise_catalog.py
+import random
+from exercise_record import ExerciseRecord
+
+
+class ExerciseCatalog:
+    """Índice de ejercicios por id y por tipo
+
+    Reúne los ejercicios incluidos y los personalizados, guardados como
+    ExerciseRecord (los diccionarios se convierten al añadirlos). Además del mapa
+    id -> ejercicio mantiene, por tipo, una lista de ids con la posición de
+    cada id, de modo que añadir, actualizar, borrar, buscar y elegir uno al
+    azar cuestan O(1). Al borrar, el último id del tipo ocupa el hueco, así
+    que el orden dentro de un tipo no es el de inserción.
+    """
+
+    def __init__(self, exercises=()):
+        self.by_id = {}       # id -> ejercicio (en orden de inserción)
+        self.type_ids = {}    # tipo -> [id]
+        self.positions = {}   # id -> posición en la lista de su tipo
+        self.version = 0      # Cambia con cada alta, cambio o baja
+        for exercise in exercises:
+            self.add(exercise)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, exercise_id):
+        return exercise_id in self.by_id
+
+    def add(self, exercise):
+        """Añadir un ejercicio (o sustituir el que tenga el mismo id)"""
+        exercise = ExerciseRecord.from_dict(exercise)
+        exercise_id = exercise["id"]
+        if exercise_id in self.by_id:
+            self.update(exercise_id, exercise)
+            return
+        self.by_id[exercise_id] = exercise
+        self.index(exercise_id, exercise["type"])
+        self.version += 1
+
+    def update(self, exercise_id, exercise):
+        """Sustituir un ejercicio, reindexándolo si cambia de tipo"""
+        exercise = ExerciseRecord.from_dict(exercise)
+        old = self.by_id.get(exercise_id)
+        if old is None:
+            raise KeyError(exercise_id)
+        self.by_id[exercise_id] = exercise
+        if old["type"] != exercise["type"]:
+            self.unindex(exercise_id, old["type"])
+            self.index(exercise_id, exercise["type"])
+        self.version += 1
+
+    def remove(self, exercise_id):
+        """Quitar un ejercicio; devuelve el ejercicio quitado o None"""
+        exercise = self.by_id.pop(exercise_id, None)
+        if exercise is not None:
+            self.unindex(exercise_id, exercise["type"])
+            self.version += 1
+        return exercise
+
+    def index(self, exercise_id, exercise_type):
+        """Registrar un id en la lista de su tipo"""
+        ids = self.type_ids.setdefault(exercise_type, [])
+        self.positions[exercise_id] = len(ids)
+        ids.append(exercise_id)
+
+    def unindex(self, exercise_id, exercise_type):
+        """Quitar un id de la lista de su tipo moviendo el último a su hueco"""
+        ids = self.type_ids[exercise_type]
+        position = self.positions.pop(exercise_id)
+        last = ids.pop()
+        if last != exercise_id:
+            ids[position] = last
+            self.positions[last] = position
+        if not ids:
+            del self.type_ids[exercise_type]
+
+    def get(self, exercise_id):
+        """Obtener un ejercicio por id"""
+        return self.by_id.get(exercise_id)
+
+    def all(self):
+        """Todos los ejercicios en orden de inserción"""
+        return list(self.by_id.values())
+
+    def types(self):
+        """Tipos con al menos un ejercicio"""
+        return list(self.type_ids)
+
+    def ids_by_type(self, exercise_type):
+        """Ids de un tipo (la lista interna: no modificar)"""
+        return self.type_ids.get(exercise_type, [])
+
+    def by_type(self, exercise_type):
+        """Ejercicios de un tipo"""
+        return [self.by_id[exercise_id] for exercise_id in self.ids_by_type(exercise_type)]
+
+    def random(self, exercise_type=None, rng=random):
+        """Elegir un ejercicio al azar, opcionalmente de un tipo"""
+        if exercise_type:
+            ids = self.ids_by_type(exercise_type)
+            return self.by_id[rng.choice(ids)] if ids else None
+        if not self.by_id:
+            return None
+        # Elegir primero el tipo ponderado por su tamaño equivale a elegir uniforme
+        types = list(self.type_ids)
+        weights = [len(self.type_ids[t]) for t in types]
+        ids = self.type_ids[rng.choices(types, weights)[0]]
+        return self.by_id[rng.choice(ids)]
@@ -1,30 +1,57 @@
 # src/exercise_manager.py
-import json
 from pathlib import Path
-from PyQt5.QtCore import QObject, pyqtSignal
-import random
-from PyQt5.QtCore import QObject
+from PyQt5.QtCore import QCoreApplication, QObject, QTimer, pyqtSignal
+from exercise_catalog import ExerciseCatalog
+from exercise_selector import ExerciseSelector
+from exercise_store import ExerciseStore
+from catalog_snapshot import load_json_catalog
+from custom_exercises import CustomExerciseManager
 
 class ExerciseManager(QObject):
     exercises_loaded = pyqtSignal()
     
-    def __init__(self):
+    def __init__(self, difficulty_weights=None, db_path="database/exercises.db"):
         super().__init__()
-        self.exercises = []
+        self.store = ExerciseStore(db_path)
+        # Catálogo compartido con los ejercicios personalizados
+        self.catalog = ExerciseCatalog()
         self.load_exercises()
+        self.custom_manager = CustomExerciseManager(self.catalog, self.store)
+        self.selector = ExerciseSelector(
+            self.catalog,
+            Path.home() / ".pausas_activas" / "exercise_bags.json",
+            difficulty_weights
+        )
+        # Las bolsas se guardan unos segundos después del último ejercicio
+        # sacado (y al salir), no en cada elección
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(5000)
+        self.save_timer.timeout.connect(self.selector.save_state)
+    
+    @property
+    def exercises(self):
+        """Todos los ejercicios del catálogo"""
+        return self.catalog.all()
     
     def load_exercises(self):
-        """Cargar ejercicios desde archivo JSON"""
+        """Cargar ejercicios desde su snapshot o desde el JSON
+        
+        El JSON solo se vuelve a analizar si ha cambiado; si no, se usa su
+        snapshot compilado (en ~/.pausas_activas). exercises.db se mantiene
+        al día para las búsquedas, pero no se lee al arrancar.
+        """
         exercises_file = Path("assets/data/exercises.json")
         
         try:
-            with open(exercises_file, "r", encoding="utf-8") as f:
-                self.exercises = json.load(f)
-            self.exercises_loaded.emit()
+            exercises = load_json_catalog(exercises_file)
+            self.store.sync_json(exercises_file)
+            if not exercises:
+                raise ValueError("catálogo vacío")
         except Exception as e:
             print(f"Error loading exercises: {e}")
             # Cargar ejercicios por defecto
-            self.exercises = [
+            exercises = [
                 {
                     "id": "neck_stretch",
                     "name": "Estiramiento de cuello",
@@ -36,21 +63,48 @@ class ExerciseManager(QObject):
                 },
                 # Más ejercicios...
             ]
+        
+        # Al recargar solo se sustituyen los ejercicios incluidos
+        for exercise in self.catalog.all():
+            if not exercise.get("custom"):
+                self.catalog.remove(exercise["id"])
+        for exercise in exercises:
+            self.catalog.add(exercise)
+        self.exercises_loaded.emit()
     
     def get_exercise(self, exercise_id):
         """Obtener ejercicio por ID"""
-        for exercise in self.exercises:
-            if exercise["id"] == exercise_id:
-                return exercise
-        return None
+        return self.catalog.get(exercise_id)
     
     def get_exercises_by_type(self, exercise_type):
         """Obtener todos los ejercicios de un tipo específico"""
-        return [ex for ex in self.exercises if ex["type"] == exercise_type]
+        return self.catalog.by_type(exercise_type)
+    
+    def get_image_path(self, exercise):
+        """Ruta de la imagen de un ejercicio ("" si no tiene)
+        
+        Los incluidos guardan el nombre del archivo en assets/images y los
+        personalizados la ruta completa en image_path.
+        """
+        if exercise.get("image_path"):
+            return exercise["image_path"]
+        if exercise.get("image"):
+            return f"assets/images/{exercise['image']}"
+        return ""
     
     def get_random_exercise(self, exercise_type=None):
-        """Obtener un ejercicio aleatorio"""
-        if exercise_type:
-            exercises = self.get_exercises_by_type(exercise_type)
-            return random.choice(exercises) if exercises else None
-        return random.choice(self.exercises) if self.exercises else None
\ No newline at end of file
+        """Obtener un ejercicio aleatorio sin repetir el anterior"""
+        exercise = self.selector.draw(exercise_type)
+        if QCoreApplication.instance() is not None:
+            # Sin aplicación Qt no hay bucle de eventos: solo se guarda con save_state
+            self.save_timer.start()
+        return exercise
+    
+    def save_state(self):
+        """Guardar ya el estado del selector (al salir de la aplicación)"""
+        self.save_timer.stop()
+        self.selector.save_state()
+    
+    def search_exercises(self, text="", exercise_type=None, difficulty=None, limit=50):
+        """Buscar ejercicios por texto, tipo y dificultad"""
+        return self.store.search(text, exercise_type, difficulty, limit)
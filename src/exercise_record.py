@@ -0,0 +1,91 @@
+# src/exercise_record.py
+import sys
+from collections.abc import Mapping
+
+_MISSING = object()  # Campo que el ejercicio original no traía
+
+
+class ExerciseRecord(Mapping):
+    """Ejercicio inmutable con __slots__ que se lee como un diccionario
+
+    Ocupa bastante menos que un dict con las mismas claves y los textos que
+    se repiten entre ejercicios (tipo y dificultad) se internan, así que
+    todos los ejercicios de un tipo comparten la misma cadena. exercise["name"],
+    exercise.get("difficulty"), "image_path" in exercise o dict(exercise)
+    funcionan como con el diccionario original; las claves que no son campos
+    conocidos se guardan aparte en extra.
+    """
+
+    FIELDS = ("id", "name", "description", "type", "duration",
+              "image", "video", "difficulty", "custom")
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, data):
+        # Los descriptores de los slots saltan el __setattr__ que lo hace inmutable
+        get = data.get
+        for field, set_field in _SETTERS:
+            set_field(self, get(field, _MISSING))
+        for field in INTERNED_FIELDS:
+            value = get(field)
+            if isinstance(value, str):
+                _SETTERS_BY_NAME[field](self, sys.intern(value))
+        _set_extra(self, None if _FIELD_SET.issuperset(data) else tuple(
+            (key, value) for key, value in data.items() if key not in _FIELD_SET
+        ))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Crear un registro a partir del diccionario de un ejercicio"""
+        if isinstance(data, cls):
+            return data
+        return cls(data)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ExerciseRecord es inmutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ExerciseRecord es inmutable")
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+        elif self.extra:
+            for extra_key, value in self.extra:
+                if extra_key == key:
+                    return value
+        raise KeyError(key)
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+        if self.extra:
+            for key, _ in self.extra:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __reduce__(self):
+        return (_from_items, (tuple(self.items()),))
+
+    def __repr__(self):
+        return f"ExerciseRecord({dict(self)!r})"
+
+    def replace(self, **changes):
+        """Copia del registro con algunos campos cambiados"""
+        return ExerciseRecord({**self, **changes})
+
+
+def _from_items(items):
+    """Reconstruir un registro copiado o serializado con pickle"""
+    return ExerciseRecord(dict(items))
+
+
+INTERNED_FIELDS = ("type", "difficulty")
+_FIELD_SET = frozenset(ExerciseRecord.FIELDS)
+_SETTERS = tuple((field, ExerciseRecord.__dict__[field].__set__) for field in ExerciseRecord.FIELDS)
+_SETTERS_BY_NAME = dict(_SETTERS)
+_set_extra = ExerciseRecord.__dict__["extra"].__set__
@@ -0,0 +1,153 @@
+# src/exercise_selector.py
+import hashlib
+import json
+import os
+import random
+from collections import deque
+from pathlib import Path
+
+ALL_TYPES = "*"  # Bolsa de los ejercicios de cualquier tipo
+
+
+class ExerciseSelector:
+    """Elección de ejercicios al azar sin repeticiones seguidas
+
+    Cada tipo tiene una bolsa barajada de ids de la que se saca por el final
+    en O(1); al vaciarse se vuelve a llenar con todos los ejercicios del tipo.
+    Con difficulty_weights cada ejercicio entra en la bolsa tantas veces como
+    el peso de su dificultad (0 lo excluye), y los últimos recent_window
+    ejercicios sacados quedan al fondo de la bolsa nueva. El estado de las
+    bolsas se guarda en state_path para continuar tras reiniciar, junto con
+    los pesos y la huella del catálogo con que se llenaron: si cambian, las
+    bolsas guardadas se descartan. draw() no escribe en disco; solo marca el
+    estado como modificado y quien lo usa llama a save_state() más tarde.
+    """
+
+    def __init__(self, catalog, state_path=None, difficulty_weights=None,
+                 recent_window=3, rng=None):
+        self.catalog = catalog
+        self.state_path = Path(state_path) if state_path else None
+        self.difficulty_weights = difficulty_weights
+        self.recent_window = recent_window
+        self.rng = rng or random.Random()
+        self.bags = {}    # tipo -> [id]; se saca del final
+        self.recent = {}  # tipo -> deque de los últimos ids sacados
+        self.dirty = False  # Hay cambios sin guardar
+        self.digest = None  # (versión del catálogo, huella)
+        self.load_state()
+
+    def load_state(self):
+        """Recuperar las bolsas guardadas"""
+        if self.state_path is None or not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if (state.get("weights") == (self.difficulty_weights or {}) and
+                    state.get("catalog") == self.catalog_digest()):
+                self.bags = {key: list(bag) for key, bag in state.get("bags", {}).items()}
+            self.recent = {
+                key: deque(ids, maxlen=self.recent_window)
+                for key, ids in state.get("recent", {}).items()
+            }
+        except (json.JSONDecodeError, Exception) as e:
+            print(f"Error loading exercise bags: {e}")
+            self.bags = {}
+            self.recent = {}
+
+    def save_state(self):
+        """Guardar las bolsas si han cambiado (escritura atómica)"""
+        if self.state_path is None or not self.dirty:
+            return
+        state = {
+            "weights": self.difficulty_weights or {},
+            "catalog": self.catalog_digest(),
+            "bags": self.bags,
+            "recent": {key: list(ids) for key, ids in self.recent.items()}
+        }
+        tmp_path = self.state_path.with_suffix(".tmp")
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+            self.dirty = False
+        except Exception as e:
+            print(f"Error saving exercise bags: {e}")
+
+    def catalog_digest(self):
+        """Huella de los ids y tipos del catálogo (se recalcula si cambia)"""
+        if self.digest is None or self.digest[0] != self.catalog.version:
+            digest = hashlib.sha1()
+            for exercise_id in sorted(self.catalog.by_id):
+                digest.update(f"{exercise_id}\t{self.catalog.get(exercise_id)['type']}\n".encode("utf-8"))
+            self.digest = (self.catalog.version, digest.hexdigest())
+        return self.digest[1]
+
+    def copies(self, exercise):
+        """Veces que un ejercicio entra en la bolsa según su dificultad"""
+        if not self.difficulty_weights:
+            return 1
+        return max(0, int(self.difficulty_weights.get(exercise.get("difficulty"), 1)))
+
+    def refill(self, key):
+        """Llenar y barajar la bolsa de un tipo"""
+        if key == ALL_TYPES:
+            ids = list(self.catalog.by_id)
+        else:
+            ids = self.catalog.ids_by_type(key)
+
+        bag = []
+        for exercise_id in ids:
+            bag.extend([exercise_id] * self.copies(self.catalog.get(exercise_id)))
+        if not bag:
+            # Todos los pesos a 0: mejor repetir que no ofrecer nada
+            bag = list(ids)
+        self.rng.shuffle(bag)
+
+        # Los recientes van al principio, que es lo último que se saca
+        recent = self.recent.get(key)
+        if recent:
+            bag = ([i for i in bag if i in recent] +
+                   [i for i in bag if i not in recent])
+        self.bags[key] = bag
+        return bag
+
+    def draw(self, exercise_type=None):
+        """Sacar el siguiente ejercicio de la bolsa de un tipo (o de todos)"""
+        key = exercise_type or ALL_TYPES
+        bag = self.bags.get(key)
+        recent = self.recent.setdefault(key, deque(maxlen=self.recent_window))
+        last = recent[-1] if recent else None
+
+        exercise_id = None
+        refilled = False
+        while exercise_id is None:
+            if not bag:
+                if refilled:
+                    return None
+                bag = self.refill(key)
+                refilled = True
+                continue
+            exercise_id = bag.pop()
+            if exercise_id not in self.catalog:
+                # Borrado desde que se llenó la bolsa
+                exercise_id = None
+
+        if exercise_id == last:
+            # Evitar repetir el anterior cambiándolo por el siguiente distinto;
+            # casi siempre es el último de la bolsa
+            for j in range(len(bag) - 1, -1, -1):
+                if bag[j] != exercise_id and bag[j] in self.catalog:
+                    bag[j], exercise_id = exercise_id, bag[j]
+                    break
+            else:
+                # Solo quedan copias del mismo: empezar ya la bolsa siguiente,
+                # donde el anterior está al fondo por reciente
+                bag = self.refill(key)
+                if bag and bag[-1] != exercise_id:
+                    exercise_id = bag.pop()
+
+        recent.append(exercise_id)
+        self.dirty = True
+        return self.catalog.get(exercise_id)
@@ -0,0 +1,249 @@
+# src/exercise_store.py
+import hashlib
+import json
+import re
+import sqlite3
+from pathlib import Path
+from storage import get_connection, transaction, timed
+from exercise_record import ExerciseRecord
+
+# Versión del esquema, guardada en PRAGMA user_version de exercises.db
+EXERCISE_SCHEMA_VERSION = 1
+
+# Columnas de la tabla y clave equivalente en los archivos JSON
+EXERCISE_COLUMNS = (
+    ("id", "id"),
+    ("name", "name"),
+    ("description", "description"),
+    ("type", "type"),
+    ("duration", "duration"),
+    ("difficulty", "difficulty"),
+    ("image_path", "image"),
+    ("video_path", "video"),
+)
+
+
+def create_exercise_tables(cursor):
+    """Crear la tabla de ejercicios con sus índices y búsqueda de texto"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS exercises (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT NOT NULL,
+        type TEXT NOT NULL,
+        duration INTEGER NOT NULL,
+        difficulty TEXT NOT NULL,
+        image_path TEXT,
+        video_path TEXT,
+        custom BOOLEAN NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_exercises_type ON exercises(type, difficulty)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_exercises_difficulty ON exercises(difficulty)")
+
+    # Huella de cada archivo JSON sincronizado
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS exercise_sources (
+        path TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        sha256 TEXT NOT NULL
+    )
+    """)
+
+    # Índice FTS5 sobre nombre y descripción, mantenido con disparadores
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'exercises_fts'")
+    fts_exists = cursor.fetchone() is not None
+    cursor.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS exercises_fts USING fts5(
+        name, description,
+        content='exercises', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS exercises_fts_insert AFTER INSERT ON exercises BEGIN
+        INSERT INTO exercises_fts(rowid, name, description)
+        VALUES (new.rowid, new.name, new.description);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS exercises_fts_delete AFTER DELETE ON exercises BEGIN
+        INSERT INTO exercises_fts(exercises_fts, rowid, name, description)
+        VALUES ('delete', old.rowid, old.name, old.description);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS exercises_fts_update AFTER UPDATE OF name, description ON exercises BEGIN
+        INSERT INTO exercises_fts(exercises_fts, rowid, name, description)
+        VALUES ('delete', old.rowid, old.name, old.description);
+        INSERT INTO exercises_fts(rowid, name, description)
+        VALUES (new.rowid, new.name, new.description);
+    END
+    """)
+    if not fts_exists:
+        # Indexar las filas que ya hubiera
+        cursor.execute("INSERT INTO exercises_fts(exercises_fts) VALUES ('rebuild')")
+    cursor.execute(f"PRAGMA user_version = {EXERCISE_SCHEMA_VERSION}")
+
+
+def load_exercise_names(db_path="database/exercises.db"):
+    """Obtener {id: nombre} de los ejercicios de exercises.db
+
+    Las sesiones de stats.db solo guardan el id del ejercicio; los reportes
+    toman el nombre de aquí. Sin catálogo devuelve un diccionario vacío.
+    """
+    if not Path(db_path).exists():
+        return {}
+    try:
+        return dict(get_connection(db_path).execute("SELECT id, name FROM exercises"))
+    except sqlite3.OperationalError:
+        return {}
+
+
+class ExerciseStore:
+    """Catálogo de ejercicios en exercises.db para las búsquedas de texto
+
+    Los archivos JSON se vuelcan a la base solo cuando cambian (primero se
+    compara fecha de modificación y tamaño, y si difieren, el hash del
+    contenido). Cargar el catálogo entero de la base es más lento que
+    analizar el JSON, así que al arrancar se usa el snapshot compilado y la
+    base solo sirve para buscar.
+    """
+
+    def __init__(self, db_path="database/exercises.db"):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Con el esquema al día no se abre ninguna transacción de escritura
+        version = get_connection(self.db_path).execute("PRAGMA user_version").fetchone()[0]
+        if version < EXERCISE_SCHEMA_VERSION:
+            with transaction(self.db_path) as cursor:
+                create_exercise_tables(cursor)
+
+    def sync_json(self, json_path, custom=False):
+        """Volcar un archivo JSON de ejercicios si ha cambiado
+
+        Sustituye los ejercicios del mismo origen (incluidos o
+        personalizados). Devuelve True si se ha leído el archivo.
+        """
+        path = Path(json_path)
+        key = str(path.resolve())
+        stat = path.stat()
+
+        conn = get_connection(self.db_path)
+        source = conn.execute("""
+        SELECT mtime_ns, size, sha256 FROM exercise_sources WHERE path = ?
+        """, (key,)).fetchone()
+        if source is not None and source[:2] == (stat.st_mtime_ns, stat.st_size):
+            return False
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        with transaction(self.db_path, "exercise_store.sync_json") as cursor:
+            if source is None or source[2] != digest:
+                self.replace_exercises(cursor, json.loads(data.decode("utf-8")), custom)
+            cursor.execute("""
+            INSERT INTO exercise_sources (path, mtime_ns, size, sha256)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                mtime_ns = excluded.mtime_ns,
+                size = excluded.size,
+                sha256 = excluded.sha256
+            """, (key, stat.st_mtime_ns, stat.st_size, digest))
+        return source is None or source[2] != digest
+
+    def replace_exercises(self, cursor, exercises, custom):
+        """Sustituir los ejercicios de un origen en la transacción abierta
+
+        Las filas que siguen existiendo se actualizan en su sitio para no
+        mover su rowid (el índice FTS lo usa).
+        """
+        rows = [
+            (
+                exercise["id"],
+                exercise["name"],
+                exercise.get("description", ""),
+                exercise["type"],
+                exercise.get("duration", 0),
+                exercise.get("difficulty") or "",
+                exercise.get("image", exercise.get("image_path")),  # Los personalizados usan image_path
+                exercise.get("video"),
+                int(custom)
+            )
+            for exercise in exercises
+        ]
+        columns = ", ".join(column for column, _ in EXERCISE_COLUMNS)
+        updates = ", ".join(f"{column} = excluded.{column}" for column, _ in EXERCISE_COLUMNS[1:])
+        cursor.executemany(f"""
+        INSERT INTO exercises ({columns}, custom)
+        VALUES ({", ".join("?" for _ in EXERCISE_COLUMNS)}, ?)
+        ON CONFLICT(id) DO UPDATE SET {updates}, custom = excluded.custom
+        WHERE excluded.custom <= exercises.custom  -- Un personalizado no pisa a un incluido
+        """, rows)
+
+        current = {row[0] for row in rows}
+        cursor.execute("SELECT id FROM exercises WHERE custom = ?", (int(custom),))
+        removed = [(exercise_id,) for exercise_id, in cursor.fetchall() if exercise_id not in current]
+        cursor.executemany("DELETE FROM exercises WHERE id = ?", removed)
+
+    def row_to_exercise(self, row):
+        """Convertir una fila en el registro que usa la aplicación"""
+        exercise = {key: value for (_, key), value in zip(EXERCISE_COLUMNS, row)}
+        if row[len(EXERCISE_COLUMNS)]:
+            exercise["custom"] = True
+        return ExerciseRecord(exercise)
+
+    def load(self, custom=None):
+        """Obtener los ejercicios (solo incluidos o personalizados si se indica)"""
+        conn = get_connection(self.db_path)
+        columns = ", ".join(column for column, _ in EXERCISE_COLUMNS)
+        with timed("exercise_store.load"):
+            if custom is None:
+                rows = conn.execute(f"SELECT {columns}, custom FROM exercises ORDER BY rowid")
+            else:
+                rows = conn.execute(f"""
+                SELECT {columns}, custom FROM exercises WHERE custom = ? ORDER BY rowid
+                """, (int(custom),))
+            return [self.row_to_exercise(row) for row in rows]
+
+    def search(self, text="", exercise_type=None, difficulty=None, limit=50):
+        """Buscar ejercicios por texto en nombre y descripción
+
+        Cada palabra del texto se busca como prefijo y sin tildes; los
+        resultados se ordenan por relevancia. Sin texto se filtra solo por
+        tipo y dificultad.
+        """
+        columns = ", ".join(f"e.{column}" for column, _ in EXERCISE_COLUMNS)
+        conditions = []
+        params = []
+        if exercise_type:
+            conditions.append("e.type = ?")
+            params.append(exercise_type)
+        if difficulty:
+            conditions.append("e.difficulty = ?")
+            params.append(difficulty)
+
+        words = re.findall(r"\w+", text)
+        if words:
+            sql = f"""
+            SELECT {columns}, e.custom
+            FROM exercises_fts
+            JOIN exercises e ON e.rowid = exercises_fts.rowid
+            WHERE exercises_fts MATCH ? {"".join(" AND " + c for c in conditions)}
+            ORDER BY exercises_fts.rank
+            LIMIT ?
+            """
+            params.insert(0, " ".join(f'"{word}"*' for word in words))
+        else:
+            sql = f"""
+            SELECT {columns}, e.custom
+            FROM exercises e
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            ORDER BY e.name
+            LIMIT ?
+            """
+        params.append(limit)
+
+        conn = get_connection(self.db_path)
+        with timed("exercise_store.search"):
+            return [self.row_to_exercise(row) for row in conn.execute(sql, params)]
@@ -0,0 +1,101 @@
+# src/load_test_users.py
+"""Prueba de carga del almacén de estadísticas con muchos usuarios
+
+Uso: python load_test_users.py [--users 10000] [--days 30] [--db ruta]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from synthetic_history import insert_sessions, INSERT_CHUNK
+from rollups import rebuild_rollups
+from streaks import rebuild_lifetime
+from stats_tracker import StatsTracker
+
+EXERCISE_IDS = ["neck_stretch", "shoulder_roll", "wrist_stretch", "back_twist", "deep_breath"]
+
+
+def populate(db_path, users, days, sessions_per_day, seed=42):
+    """Insertar sesiones sintéticas para todos los usuarios"""
+    rng = random.Random(seed)
+    first_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+
+    rows = []
+    inserted = 0
+    for user_id in range(1, users + 1):
+        for day in range(days):
+            day_start = first_day + timedelta(days=day)
+            for _ in range(rng.randint(0, sessions_per_day * 2)):
+                start = day_start + timedelta(minutes=rng.randint(7 * 60, 19 * 60))
+                rows.append((
+                    user_id, rng.choice(EXERCISE_IDS), start.isoformat(),
+                    int(start.timestamp()), start.strftime("%Y-%m-%d"),
+                    rng.choice((20, 30, 40, 60)), rng.random() < 0.9
+                ))
+
+        if len(rows) >= INSERT_CHUNK:
+            inserted += insert_sessions(db_path, rows)
+            rows = []
+    inserted += insert_sessions(db_path, rows)
+
+    rebuild_rollups(db_path)
+    rebuild_lifetime(db_path)
+    return inserted
+
+
+def measure(tracker, users, samples, seed=7):
+    """Medir la latencia de las consultas por usuario sobre una muestra"""
+    rng = random.Random(seed)
+    queries = {
+        "get_today_stats": tracker.get_today_stats,
+        "get_weekly_stats": tracker.get_weekly_stats,
+        "get_weekly_totals": tracker.get_weekly_totals,
+        "get_exercise_breakdown": tracker.get_exercise_breakdown,
+        "get_lifetime_stats": tracker.get_lifetime_stats,
+        "log_exercise": lambda: tracker.log_exercise(rng.choice(EXERCISE_IDS), 30),
+    }
+    latencies = {name: [] for name in queries}
+
+    for _ in range(samples):
+        tracker.user_id = rng.randint(1, users)
+        for name, query in queries.items():
+            start = time.perf_counter()
+            query()
+            latencies[name].append((time.perf_counter() - start) * 1000)
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de stats.db por usuario")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--sessions-per-day", type=int, default=3)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--db", help="Base de datos a usar (por defecto, una temporal)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "stats_load.db")
+    tracker = StatsTracker(db_path=db_path)
+    tracker.backfill_thread.join()
+
+    start = time.perf_counter()
+    inserted = populate(db_path, args.users, args.days, args.sessions_per_day)
+    elapsed = time.perf_counter() - start
+    print(f"{inserted} sesiones de {args.users} usuarios en {elapsed:.1f} s "
+          f"({inserted / elapsed:.0f} filas/s)")
+
+    latencies = measure(tracker, args.users, args.samples)
+    print(f"{'consulta':<24}{'p50 ms':>10}{'p95 ms':>10}{'máx ms':>10}")
+    for name, values in latencies.items():
+        values.sort()
+        p95 = values[int(len(values) * 0.95) - 1]
+        print(f"{name:<24}{statistics.median(values):>10.3f}{p95:>10.3f}{values[-1]:>10.3f}")
+    print(f"Base de datos: {db_path}")
+
+
+if __name__ == "__main__":
+    main()
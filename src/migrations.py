@@ -0,0 +1,204 @@
+# src/migrations.py
+import threading
+import time
+from datetime import datetime
+from storage import get_connection, transaction, close_thread_connections
+from rollups import ROLLUP_TABLES, create_rollup_tables, rebuild_rollups
+from streaks import create_lifetime_table, recompute_lifetime
+from archiver import create_archive_index
+from query_cache import create_generation_table
+
+
+def migration_1_session_epochs(cursor):
+    """Añadir columnas de época y día local con índices de cobertura"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(exercise_sessions)")}
+    if "start_epoch" not in columns:
+        cursor.execute("ALTER TABLE exercise_sessions ADD COLUMN start_epoch INTEGER")
+    if "local_day" not in columns:
+        cursor.execute("ALTER TABLE exercise_sessions ADD COLUMN local_day TEXT")
+
+    # Rangos de tiempo con todos los datos que usan los reportes
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_sessions_epoch
+    ON exercise_sessions (start_epoch, exercise_id, duration, completed)
+    """)
+    # Agrupaciones por día local
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_sessions_day
+    ON exercise_sessions (local_day, start_epoch, exercise_id)
+    """)
+    # Historial por ejercicio
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_sessions_exercise
+    ON exercise_sessions (exercise_id, start_epoch)
+    """)
+
+
+def migration_2_rollups(cursor):
+    """Crear los agregados por hora, semana, mes y ejercicio"""
+    create_rollup_tables(cursor)
+    return True
+
+
+def migration_3_users(cursor):
+    """Particionar sesiones, estadísticas diarias y agregados por usuario"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(exercise_sessions)")}
+    if "user_id" not in columns:
+        cursor.execute("""
+        ALTER TABLE exercise_sessions ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1
+        """)
+
+    # Índices con el usuario como prefijo (sustituyen a los globales)
+    cursor.execute("DROP INDEX IF EXISTS idx_sessions_epoch")
+    cursor.execute("DROP INDEX IF EXISTS idx_sessions_day")
+    cursor.execute("DROP INDEX IF EXISTS idx_sessions_exercise")
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_sessions_user_epoch
+    ON exercise_sessions (user_id, start_epoch, exercise_id, duration, completed)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_sessions_user_day
+    ON exercise_sessions (user_id, local_day, start_epoch, exercise_id)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_sessions_user_exercise
+    ON exercise_sessions (user_id, exercise_id, start_epoch)
+    """)
+
+    # daily_stats pasa a tener clave (user_id, date)
+    cursor.execute("""
+    CREATE TABLE daily_stats_by_user (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        exercises_completed INTEGER NOT NULL,
+        total_time INTEGER NOT NULL,
+        current_streak INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, date)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    INSERT INTO daily_stats_by_user (user_id, date, exercises_completed, total_time)
+    SELECT 1, date, exercises_completed, total_time FROM daily_stats
+    """)
+    cursor.execute("DROP TABLE daily_stats")
+    cursor.execute("ALTER TABLE daily_stats_by_user RENAME TO daily_stats")
+
+    # Los agregados se recrean con clave por usuario
+    for table in ROLLUP_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    create_rollup_tables(cursor)
+    return True
+
+
+def migration_4_lifetime(cursor):
+    """Rachas y totales por usuario mantenidos de forma incremental"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(lifetime_stats)")}
+    if columns and "user_id" not in columns:
+        # Tabla global heredada de database_init, nunca mantenida
+        cursor.execute("DROP TABLE lifetime_stats")
+    create_lifetime_table(cursor)
+    recompute_lifetime(cursor)
+
+
+def migration_5_archives(cursor):
+    """Índice de particiones mensuales de sesiones archivadas"""
+    create_archive_index(cursor)
+
+
+def migration_6_data_generation(cursor):
+    """Contador de cambios masivos que invalida las cachés de consultas"""
+    create_generation_table(cursor)
+
+
+def migration_7_daily_breakdowns(cursor):
+    """Agregados por día y ejercicio y por día y hora para los reportes"""
+    create_rollup_tables(cursor)
+    return True
+
+
+# Migraciones de stats.db en orden; la versión es la posición en la lista.
+# Las que devuelven True requieren recalcular los agregados al terminar.
+STATS_MIGRATIONS = [
+    migration_1_session_epochs,
+    migration_2_rollups,
+    migration_3_users,
+    migration_4_lifetime,
+    migration_5_archives,
+    migration_6_data_generation,
+    migration_7_daily_breakdowns,
+]
+
+
+def migrate_stats_db(db_path):
+    """Aplicar las migraciones pendientes de stats.db"""
+    conn = get_connection(db_path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    needs_rollups = False
+    for number, migration in enumerate(STATS_MIGRATIONS, start=1):
+        if number <= version:
+            continue
+        with transaction(db_path, f"migrations.stats_{number}") as cursor:
+            needs_rollups = migration(cursor) or needs_rollups
+            cursor.execute(f"PRAGMA user_version = {number}")
+
+    if needs_rollups:
+        # Incluye las particiones archivadas, que no se pueden adjuntar
+        # dentro de la transacción de la migración
+        rebuild_rollups(db_path)
+
+    return len(STATS_MIGRATIONS)
+
+
+def backfill_session_epochs(db_path, chunk_size=2000, pause=0.01):
+    """Rellenar start_epoch y local_day de sesiones antiguas por bloques
+
+    Cada bloque es una transacción corta, con una pausa entre bloques para
+    no bloquear a otros escritores. Devuelve el número de filas rellenadas.
+    """
+    conn = get_connection(db_path)
+    total = 0
+    last_id = 0
+
+    while True:
+        # Recorrer por clave primaria para no depender de un índice sobre NULL
+        rows = conn.execute("""
+        SELECT id, start_time FROM exercise_sessions
+        WHERE id > ? AND start_epoch IS NULL
+        ORDER BY id
+        LIMIT ?
+        """, (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        updates = []
+        for session_id, start_time in rows:
+            dt = datetime.fromisoformat(start_time)
+            updates.append((int(dt.timestamp()), dt.strftime("%Y-%m-%d"), session_id))
+
+        with transaction(db_path, "migrations.backfill_chunk") as cursor:
+            cursor.executemany("""
+            UPDATE exercise_sessions SET start_epoch = ?, local_day = ?
+            WHERE id = ?
+            """, updates)
+
+        total += len(updates)
+        time.sleep(pause)
+
+    return total
+
+
+def start_backfill(db_path, chunk_size=2000):
+    """Lanzar el relleno de épocas en un hilo en segundo plano"""
+    def run():
+        try:
+            backfill_session_epochs(db_path, chunk_size)
+        except Exception as e:
+            print(f"Error backfilling session epochs: {e}")
+        finally:
+            close_thread_connections()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
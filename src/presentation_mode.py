@@ -107,7 +107,7 @@ class PresentationMode(QWidget):
         # Actualizar UI
         self.exercise_title.setText(self.current_exercise['name'])
         
-        pixmap = QPixmap(f"assets/images/{self.current_exercise['image']}")
+        pixmap = QPixmap(self.exercise_manager.get_image_path(self.current_exercise))
         self.exercise_image.setPixmap(pixmap.scaledToWidth(800, Qt.SmoothTransformation))
         
         self.exercise_description.setText(self.current_exercise['description'])
@@ -0,0 +1,110 @@
+# src/query_cache.py
+import copy
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def create_generation_table(cursor):
+    """Crear el contador de cambios masivos de stats.db"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS data_generation (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        value INTEGER NOT NULL
+    )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO data_generation (id, value) VALUES (1, 0)")
+
+
+def bump_generation(cursor):
+    """Marcar un cambio que invalida las cachés de consultas de todo el historial
+
+    Lo usan las escrituras que no pasan por StatsTracker (importaciones,
+    archivado), dentro de su propia transacción.
+    """
+    create_generation_table(cursor)
+    cursor.execute("UPDATE data_generation SET value = value + 1 WHERE id = 1")
+
+
+def read_generation(conn):
+    """Leer el contador de cambios masivos (0 si todavía no existe)"""
+    try:
+        row = conn.execute("SELECT value FROM data_generation WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+class QueryCache:
+    """Caché LRU de resultados de consultas con invalidación por día
+
+    Cada entrada guarda el usuario y el rango de días ('YYYY-MM-DD',
+    inclusivo) del que depende; None como rango significa que depende de
+    todo el historial. Una escritura en un día invalida solo las entradas
+    de ese usuario cuyo rango lo contiene.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # clave -> (usuario, rango, valor)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0  # Cambia con cada invalidación
+
+    def get_or_compute(self, key, user_id, day_range, compute):
+        """Devolver el valor en caché o calcularlo y guardarlo"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[2])
+            self.misses += 1
+            generation = self.generation
+
+        value = compute()
+
+        with self.lock:
+            if generation != self.generation:
+                # Hubo una escritura mientras se calculaba: no guardar
+                return copy.deepcopy(value)
+            self.entries[key] = (user_id, day_range, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return copy.deepcopy(value)
+
+    def invalidate_day(self, user_id, day):
+        """Invalidar las entradas del usuario que dependen de un día"""
+        with self.lock:
+            stale = [
+                key for key, (entry_user, day_range, _) in self.entries.items()
+                if entry_user == user_id
+                and (day_range is None or day_range[0] <= day <= day_range[1])
+            ]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+            self.generation += 1
+
+    def clear(self):
+        """Vaciar la caché"""
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.generation += 1
+
+    def get_stats(self):
+        """Obtener contadores de aciertos, fallos y desalojos"""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self.entries)
+            }
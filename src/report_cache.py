@@ -0,0 +1,95 @@
+# src/report_cache.py
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class ReportCache:
+    """Caché de reportes generados, direccionada por contenido
+
+    Cada archivo se guarda con el hash de los datos que lo producen (incluida
+    la versión de la plantilla), así que un reporte cuyos datos no cambian se
+    reutiliza sin volver a renderizarlo. Al superar max_bytes se borran los
+    archivos usados hace más tiempo (la fecha de modificación marca el uso).
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None  # Se calcula al primer guardado
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, *parts):
+        """Hash estable de los datos de un reporte"""
+        payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_or_render(self, key, suffix, render):
+        """Devolver el archivo de la clave, renderizándolo si no existe
+
+        render(ruta) escribe el archivo; se renderiza en un temporal y se
+        renombra, así que nunca se ve un archivo a medio escribir.
+        """
+        path = self.cache_dir / f"{key}{suffix}"
+        try:
+            os.utime(path)
+            with self.lock:
+                self.hits += 1
+            return path
+        except FileNotFoundError:
+            pass
+
+        tmp_path = self.cache_dir / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp{suffix}"
+        try:
+            render(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        with self.lock:
+            self.misses += 1
+            if self.total_bytes is None:
+                self.total_bytes = sum(f.stat().st_size for f in self.cache_dir.iterdir() if f.is_file())
+            else:
+                self.total_bytes += path.stat().st_size
+            if self.total_bytes > self.max_bytes:
+                self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Borrar los archivos menos usados hasta volver al límite"""
+        files = []
+        for f in self.cache_dir.iterdir():
+            if f.is_file() and f != keep and ".tmp" not in f.suffixes:
+                stat = f.stat()
+                files.append((stat.st_mtime, stat.st_size, f))
+        files.sort()
+
+        # Recalcular el total por si otro proceso también escribe en la caché
+        self.total_bytes = sum(size for _, size, _ in files)
+        if keep is not None and keep.exists():
+            self.total_bytes += keep.stat().st_size
+
+        for _, size, f in files:
+            if self.total_bytes <= self.max_bytes:
+                break
+            f.unlink(missing_ok=True)
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def get_stats(self):
+        """Obtener aciertos, fallos, desalojos y tamaño de la caché"""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes": self.total_bytes
+            }
@@ -1,20 +1,132 @@
 # src/report_generator.py
 from PyQt5.QtPrintSupport import QPrinter
-from PyQt5.QtGui import QPainter, QTextDocument
-from datetime import datetime, timedelta
-import sqlite3
+from PyQt5.QtGui import QPainter, QTextDocument, QFont, QFontMetrics, QColor
+from PyQt5.QtCore import Qt, QSizeF, QRectF
+from datetime import date as Date, datetime, timedelta
+from html import escape
 from pathlib import Path
 import csv
-from pathlib import Path
-from datetime import datetime
+import gzip
+import os
+import shutil
+from storage import get_connection, timed
+from archiver import iter_partitions
+from report_cache import ReportCache
+from rollups import iso_week
+from exercise_store import load_exercise_names
+
+# Cambiar al modificar las plantillas o el renderizado: invalida la caché
+REPORT_TEMPLATE_VERSION = 2
+
+# Filas leídas por bloque y entre avisos de progreso al exportar
+EXPORT_CHUNK_SIZE = 1000
+
+REPORT_STYLE = """
+    body { font-family: Arial; }
+    h1 { color: #2c3e50; }
+    .header { text-align: center; margin-bottom: 30px; }
+    .stats { margin-bottom: 20px; }
+    table { width: 100%; border-collapse: collapse; margin-top: 10px; }
+    th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+    th { background-color: #f2f2f2; }
+"""
+
+# Las filas de <thead> se repiten en cada página de la tabla
+DAILY_REPORT_TEMPLATE = """
+<html>
+<head><style>{style}</style></head>
+<body>
+    <div class="header">
+        <h1>Reporte Diario de Pausas Activas</h1>
+        <p>{date_label}</p>
+    </div>
+    
+    <div class="stats">
+        <h2>Estadísticas</h2>
+        <p><strong>Pausas completadas:</strong> {completed}</p>
+        <p><strong>Tiempo total:</strong> {total_time} minutos</p>
+    </div>
+    
+    <div class="exercises">
+        <h2>Ejercicios Realizados</h2>
+        <table width="100%">
+            <thead><tr><th>Hora</th><th>Ejercicio</th><th>Duración</th></tr></thead>
+            <tbody>{rows}</tbody>
+        </table>
+    </div>
+</body>
+</html>
+"""
+
+EXERCISE_ROW_TEMPLATE = "<tr><td>{time}</td><td>{name}</td><td>{duration} min</td></tr>"
+
+PERIOD_TITLES = {
+    "week": "Reporte Semanal de Pausas Activas",
+    "month": "Reporte Mensual de Pausas Activas",
+    "year": "Reporte Anual de Pausas Activas",
+}
+
+PERIOD_FILE_NAMES = {"week": "semanal", "month": "mensual", "year": "anual"}
+
+PERIOD_REPORT_TEMPLATE = """
+<html>
+<head><style>{style}</style></head>
+<body>
+    <div class="header">
+        <h1>{title}</h1>
+        <p>{period_label}</p>
+    </div>
+    
+    <div class="stats">
+        <h2>Estadísticas</h2>
+        <p><strong>Pausas:</strong> {sessions}</p>
+        <p><strong>Pausas completadas:</strong> {completed}</p>
+        <p><strong>Tiempo total:</strong> {total_time} minutos</p>
+    </div>
+    
+    <h2>Evolución</h2>
+    <table width="100%">
+        <thead><tr><th>{series_label}</th><th>Pausas completadas</th><th>Tiempo total</th></tr></thead>
+        <tbody>{series_rows}</tbody>
+    </table>
+    
+    <h2>Por ejercicio</h2>
+    <table width="100%">
+        <thead><tr><th>Ejercicio</th><th>Pausas</th><th>Completadas</th><th>Tiempo total</th></tr></thead>
+        <tbody>{exercise_rows}</tbody>
+    </table>
+    
+    <h2>Por hora del día</h2>
+    <table width="100%">
+        <thead><tr><th>Hora</th><th>Pausas</th><th></th></tr></thead>
+        <tbody>{hour_rows}</tbody>
+    </table>
+</body>
+</html>
+"""
+
+SERIES_ROW_TEMPLATE = "<tr><td>{label}</td><td>{completed}</td><td>{total_time} min</td></tr>"
+BREAKDOWN_ROW_TEMPLATE = (
+    "<tr><td>{name}</td><td>{sessions}</td><td>{completed}</td><td>{total_time} min</td></tr>"
+)
+HOUR_ROW_TEMPLATE = "<tr><td>{hour:02d}:00</td><td>{sessions}</td><td>{bar}</td></tr>"
 
 class ReportGenerator:
-    def __init__(self):
+    def __init__(self, user_id=1, db_path="database/stats.db",
+                 exercises_db_path="database/exercises.db"):
+        self.db_path = db_path
+        self.exercises_db_path = exercises_db_path
+        self.user_id = user_id
         self.reports_dir = Path.home() / ".pausas_activas" / "reports"
-        self.reports_dir.mkdir(exist_ok=True)
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = ReportCache(Path.home() / ".pausas_activas" / "report_cache")
     
     def generate_daily_report(self, date=None):
-        """Generar reporte diario en PDF"""
+        """Generar reporte diario en PDF
+        
+        Devuelve reports/reporte_YYYYMMDD.pdf; si los datos del día no han
+        cambiado se reutiliza el PDF de la caché sin renderizar.
+        """
         if date is None:
             date = datetime.now().date()
         
@@ -22,83 +134,224 @@ class ReportGenerator:
         stats = self.get_daily_stats(date)
         exercises = self.get_daily_exercises(date)
         
-        # Crear documento HTML
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial; margin: 20px; }}
-                h1 {{ color: #2c3e50; }}
-                .header {{ text-align: center; margin-bottom: 30px; }}
-                .stats {{ margin-bottom: 20px; }}
-                table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
-                th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                th {{ background-color: #f2f2f2; }}
-                .footer {{ margin-top: 30px; font-size: 0.8em; text-align: center; color: #7f8c8d; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>Reporte Diario de Pausas Activas</h1>
-                <p>{date.strftime('%A, %d de %B de %Y')}</p>
-            </div>
-            
-            <div class="stats">
-                <h2>Estadísticas</h2>
-                <p><strong>Pausas completadas:</strong> {stats.get('exercises_completed', 0)}</p>
-                <p><strong>Tiempo total:</strong> {stats.get('total_time', 0)} minutos</p>
-            </div>
-            
-            <div class="exercises">
-                <h2>Ejercicios Realizados</h2>
-                <table>
-                    <tr>
-                        <th>Hora</th>
-                        <th>Ejercicio</th>
-                        <th>Duración</th>
-                    </tr>
+        key = self.cache.key("daily", REPORT_TEMPLATE_VERSION, date.isoformat(), stats, exercises)
+        cached_path = self.cache.get_or_render(
+            key, ".pdf",
+            lambda path: self.render_daily_report(date, stats, exercises, str(path))
+        )
+        return self.publish_report(cached_path, f"reporte_{date.strftime('%Y%m%d')}.pdf")
+    
+    def generate_weekly_report(self, date=None):
+        """Generar el reporte de la semana ISO que contiene una fecha"""
+        return self.generate_period_report("week", date)
+    
+    def generate_monthly_report(self, date=None):
+        """Generar el reporte del mes que contiene una fecha"""
+        return self.generate_period_report("month", date)
+    
+    def generate_yearly_report(self, date=None):
+        """Generar el reporte del año que contiene una fecha"""
+        return self.generate_period_report("year", date)
+    
+    def generate_period_report(self, period, date=None):
+        """Generar un reporte semanal, mensual o anual en PDF (con caché)"""
+        if date is None:
+            date = datetime.now().date()
+        
+        data = self.get_period_data(period, date)
+        key = self.cache.key("period", REPORT_TEMPLATE_VERSION, data)
+        cached_path = self.cache.get_or_render(
+            key, ".pdf", lambda path: self.render_period_report(data, str(path))
+        )
+        start = data["start"].replace("-", "")
+        return self.publish_report(cached_path, f"reporte_{PERIOD_FILE_NAMES[period]}_{start}.pdf")
+    
+    def publish_report(self, cached_path, file_name):
+        """Dejar un PDF de la caché en la carpeta de reportes con su nombre
+        
+        Se enlaza (o se copia si no se puede) a un temporal que luego se
+        renombra; la caché sigue siendo interna y puede borrar su archivo.
         """
+        report_path = self.reports_dir / file_name
+        try:
+            if report_path.samefile(cached_path):
+                return report_path
+        except FileNotFoundError:
+            pass
         
-        for ex in exercises:
-            html += f"""
-                    <tr>
-                        <td>{ex['time']}</td>
-                        <td>{ex['name']}</td>
-                        <td>{ex['duration']} min</td>
-                    </tr>
-            """
-        
-        html += """
-                </table>
-            </div>
-            
-            <div class="footer">
-                <p>Generado por Pausas Activas Profesional • {date}</p>
-            </div>
-        </body>
-        </html>
+        tmp_path = self.reports_dir / f"{file_name}.{os.getpid()}.tmp"
+        try:
+            try:
+                os.link(cached_path, tmp_path)
+            except OSError:
+                shutil.copyfile(cached_path, tmp_path)
+            os.replace(tmp_path, report_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return report_path
+    
+    def period_bounds(self, period, date):
+        """Primer y último día del periodo que contiene una fecha"""
+        if period == "week":
+            start = date - timedelta(days=date.weekday())
+            return start, start + timedelta(days=6)
+        if period == "month":
+            start = date.replace(day=1)
+            next_month = (start + timedelta(days=32)).replace(day=1)
+            return start, next_month - timedelta(days=1)
+        if period == "year":
+            return Date(date.year, 1, 1), Date(date.year, 12, 31)
+        raise ValueError(f"Periodo no válido: {period}")
+    
+    def get_period_data(self, period, date):
+        """Leer los datos agregados de un periodo
+        
+        Los totales salen de weekly_rollup o monthly_rollup, la evolución de
+        daily_stats (semana y mes) o monthly_rollup (año), y los desgloses por
+        ejercicio y hora de daily_exercise_rollup y daily_hourly_rollup: no se
+        lee ninguna sesión, así que el coste depende solo de los días del
+        periodo.
         """
+        conn = get_connection(self.db_path)
+        start_date, end_date = self.period_bounds(period, date)
         
-        # Generar PDF
-        report_path = self.reports_dir / f"reporte_{date.strftime('%Y%m%d')}.pdf"
-        self.html_to_pdf(html, str(report_path))
+        with timed(f"reports.get_{period}_data"):
+            if period == "week":
+                totals = conn.execute("""
+                SELECT sessions, exercises_completed, total_time FROM weekly_rollup
+                WHERE user_id = ? AND week = ?
+                """, (self.user_id, iso_week(start_date.isoformat()))).fetchall()
+            else:
+                months = conn.execute("""
+                SELECT month, sessions, exercises_completed, total_time FROM monthly_rollup
+                WHERE user_id = ? AND month BETWEEN ? AND ?
+                ORDER BY month
+                """, (self.user_id, start_date.isoformat()[:7], end_date.isoformat()[:7])).fetchall()
+                totals = [row[1:] for row in months]
+            
+            if period == "year":
+                series = [(month, completed, total_time) for month, _, completed, total_time in months]
+            else:
+                series = conn.execute("""
+                SELECT date, exercises_completed, total_time FROM daily_stats
+                WHERE user_id = ? AND date BETWEEN ? AND ?
+                ORDER BY date
+                """, (self.user_id, start_date.isoformat(), end_date.isoformat())).fetchall()
+            
+            names = self.get_exercise_names()
+            exercises = {}
+            day_range = (self.user_id, start_date.isoformat(), end_date.isoformat())
+            for exercise_id, sessions, completed, total_time in conn.execute("""
+            SELECT exercise_id, SUM(sessions), SUM(exercises_completed), SUM(total_time)
+            FROM daily_exercise_rollup
+            WHERE user_id = ? AND day BETWEEN ? AND ?
+            GROUP BY exercise_id
+            """, day_range):
+                # Dos ids pueden tener el mismo nombre: se suman
+                entry = exercises.setdefault(names.get(exercise_id, exercise_id), [0, 0, 0])
+                entry[0] += sessions
+                entry[1] += completed
+                entry[2] += total_time
+            
+            hours = [0] * 24
+            for hour, sessions in conn.execute("""
+            SELECT hour, SUM(sessions)
+            FROM daily_hourly_rollup
+            WHERE user_id = ? AND day BETWEEN ? AND ?
+            GROUP BY hour
+            """, day_range):
+                hours[hour] += sessions
         
-        return report_path
+        return {
+            "period": period,
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "sessions": sum(row[0] for row in totals),
+            "exercises_completed": sum(row[1] for row in totals),
+            "total_time": sum(row[2] for row in totals),
+            "series": [list(row) for row in series],
+            "exercises": sorted(
+                ([name, *values] for name, values in exercises.items()),
+                key=lambda row: (-row[1], row[0])
+            ),
+            "hours": hours
+        }
+    
+    def render_period_report(self, data, report_path):
+        """Generar el PDF de un reporte de periodo a partir de sus datos"""
+        title = PERIOD_TITLES[data["period"]]
+        period_label = f"{data['start']} — {data['end']}"
+        busiest = max(data["hours"]) or 1
+        
+        html = PERIOD_REPORT_TEMPLATE.format(
+            style=REPORT_STYLE,
+            title=title,
+            period_label=period_label,
+            sessions=data["sessions"],
+            completed=data["exercises_completed"],
+            total_time=data["total_time"],
+            series_label="Mes" if data["period"] == "year" else "Día",
+            series_rows="".join([
+                SERIES_ROW_TEMPLATE.format(label=label, completed=completed, total_time=total_time)
+                for label, completed, total_time in data["series"]
+            ]),
+            exercise_rows="".join([
+                BREAKDOWN_ROW_TEMPLATE.format(
+                    name=escape(str(name)), sessions=sessions,
+                    completed=completed, total_time=total_time
+                )
+                for name, sessions, completed, total_time in data["exercises"]
+            ]),
+            hour_rows="".join([
+                HOUR_ROW_TEMPLATE.format(
+                    hour=hour, sessions=sessions,
+                    bar="█" * round(30 * sessions / busiest)
+                )
+                for hour, sessions in enumerate(data["hours"]) if sessions
+            ])
+        )
+        
+        self.html_to_pdf(
+            html, str(report_path),
+            header=f"{title} • {period_label}",
+            footer="Generado por Pausas Activas Profesional"
+        )
+    
+    def render_daily_report(self, date, stats, exercises, report_path):
+        """Generar el PDF de un reporte diario a partir de sus datos"""
+        date_label = date.strftime('%A, %d de %B de %Y')
+        rows = "".join([
+            EXERCISE_ROW_TEMPLATE.format(
+                time=ex['time'], name=escape(str(ex['name'])), duration=ex['duration']
+            )
+            for ex in exercises
+        ])
+        html = DAILY_REPORT_TEMPLATE.format(
+            style=REPORT_STYLE,
+            date_label=date_label,
+            completed=stats.get('exercises_completed', 0),
+            total_time=stats.get('total_time', 0),
+            rows=rows
+        )
+        
+        self.html_to_pdf(
+            html, str(report_path),
+            header=f"Reporte Diario de Pausas Activas • {date_label}",
+            footer=f"Generado por Pausas Activas Profesional • {date}"
+        )
     
     def get_daily_stats(self, date):
         """Obtener estadísticas diarias desde la base de datos"""
-        conn = sqlite3.connect("database/stats.db")
-        cursor = conn.cursor()
+        conn = get_connection(self.db_path)
         
         date_str = date.strftime("%Y-%m-%d")
-        cursor.execute("""
-        SELECT exercises_completed, total_time 
-        FROM daily_stats 
-        WHERE date = ?
-        """, (date_str,))
-        
-        result = cursor.fetchone()
-        conn.close()
+        with timed("reports.get_daily_stats"):
+            result = conn.execute("""
+            SELECT exercises_completed, total_time 
+            FROM daily_stats 
+            WHERE user_id = ? AND date = ?
+            """, (self.user_id, date_str)).fetchone()
         
         if result:
             return {
@@ -109,107 +362,270 @@ class ReportGenerator:
     
     def get_daily_exercises(self, date):
         """Obtener ejercicios diarios desde la base de datos"""
-        conn = sqlite3.connect("database/stats.db")
-        cursor = conn.cursor()
+        conn = get_connection(self.db_path)
         
-        start_time = datetime.combine(date, datetime.min.time()).isoformat()
-        end_time = datetime.combine(date + timedelta(days=1), datetime.min.time()).isoformat()
+        start = datetime.combine(date, datetime.min.time())
+        end = datetime.combine(date + timedelta(days=1), datetime.min.time())
         
-        cursor.execute("""
-        SELECT es.start_time, e.name, es.duration
-        FROM exercise_sessions es
-        JOIN exercises e ON es.exercise_id = e.id
-        WHERE es.start_time BETWEEN ? AND ?
-        ORDER BY es.start_time
-        """, (start_time, end_time))
+        names = self.get_exercise_names()
+        with timed("reports.get_daily_exercises"):
+            rows = self.query_sessions(conn, """
+            SELECT es.start_time, es.exercise_id, es.duration
+            FROM {sessions} es
+            WHERE {range}
+            ORDER BY es.start_epoch
+            """, start, end)
         
         exercises = []
-        for row in cursor.fetchall():
+        for row in rows:
             dt = datetime.fromisoformat(row[0])
             exercises.append({
                 "time": dt.strftime("%H:%M"),
-                "name": row[1],
+                "name": names.get(row[1], row[1]),
                 "duration": row[2]
             })
         
-        conn.close()
         return exercises
     
-    def html_to_pdf(self, html, output_path):
-        """Convertir HTML a PDF"""
+    def html_to_pdf(self, html, output_path, header="", footer=""):
+        """Convertir HTML a PDF repartiendo el contenido en páginas
+        
+        El documento se maqueta una sola vez con el tamaño útil de la página
+        y se pinta página a página, recortando la franja que corresponde a
+        cada una, con encabezado y pie (que incluye "Página N de M").
+        """
         printer = QPrinter(QPrinter.HighResolution)
         printer.setOutputFormat(QPrinter.PdfFormat)
         printer.setOutputFileName(output_path)
         
+        painter = QPainter(printer)
+        font = QFont("Arial", 8)
+        painter.setFont(font)
+        margin = QFontMetrics(font, printer).height() * 2
+        
+        page = printer.pageRect(QPrinter.DevicePixel)
+        body = QRectF(0, margin, page.width(), page.height() - 2 * margin)
+        
         doc = QTextDocument()
+        doc.documentLayout().setPaintDevice(printer)
+        doc.setPageSize(QSizeF(body.width(), body.height()))
         doc.setHtml(html)
-        doc.setPageSize(printer.pageRect().size())
+        page_count = doc.pageCount()
+        
+        for number in range(page_count):
+            if number > 0:
+                printer.newPage()
+            
+            painter.save()
+            painter.translate(body.left(), body.top() - number * body.height())
+            doc.drawContents(painter, QRectF(0, number * body.height(), body.width(), body.height()))
+            painter.restore()
+            
+            painter.setPen(QColor("#7f8c8d"))
+            if header:
+                painter.drawText(QRectF(0, 0, page.width(), margin),
+                                 Qt.AlignLeft | Qt.AlignVCenter, header)
+            painter.drawText(QRectF(0, page.height() - margin, page.width(), margin),
+                             Qt.AlignLeft | Qt.AlignVCenter, footer)
+            painter.drawText(QRectF(0, page.height() - margin, page.width(), margin),
+                             Qt.AlignRight | Qt.AlignVCenter,
+                             f"Página {number + 1} de {page_count}")
         
-        painter = QPainter(printer)
-        doc.drawContents(painter)
         painter.end()
+        return page_count
 
-    def export_to_csv(self, start_date, end_date):
-        """Exportar datos a CSV"""
-        data = self.get_range_stats(start_date, end_date)
+    def export_to_csv(self, start_date, end_date, granularity="day", compress=False,
+                      progress=None):
+        """Exportar datos a CSV escribiendo a medida que se leen
         
-        csv_path = self.reports_dir / f"export_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.csv"
+        granularity es "day" (una fila por día) o "session" (una fila por
+        sesión). Con compress se escribe un .csv.gz. progress(filas, total)
+        se llama cada EXPORT_CHUNK_SIZE filas; si devuelve False la
+        exportación se cancela, se borra el archivo y se devuelve None.
+        """
+        if granularity not in ("day", "session"):
+            raise ValueError(f"Granularidad no válida: {granularity}")
         
-        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        suffix = "_sesiones" if granularity == "session" else ""
+        extension = ".csv.gz" if compress else ".csv"
+        csv_path = self.reports_dir / (
+            f"export_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}"
+            f"{suffix}{extension}"
+        )
+        
+        if granularity == "session":
+            header = ["Fecha", "Hora", "Ejercicio", "Duración", "Completado"]
+            total, rows = self.count_range_sessions(start_date, end_date), (
+                [row[0][:10], row[0][11:16], row[1], row[2], int(row[3])]
+                for row in self.iter_range_sessions(start_date, end_date)
+            )
+        else:
+            header = ["Fecha", "Pausas Completadas", "Tiempo Total (min)", "Ejercicios Realizados"]
+            total, rows = self.count_range_days(start_date, end_date), (
+                [day["date"], day["exercises_completed"], day["total_time"],
+                 ", ".join(day["exercises"])]
+                for day in self.iter_range_stats(start_date, end_date)
+            )
+        
+        opener = gzip.open if compress else open
+        written = 0
+        cancelled = False
+        with timed("reports.export_to_csv"), \
+                opener(csv_path, "wt", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
+            writer.writerow(header)
             
-            # Escribir encabezados
-            writer.writerow(["Fecha", "Pausas Completadas", "Tiempo Total (min)", "Ejercicios Realizados"])
-            
-            # Escribir datos
-            for row in data:
-                writer.writerow([
-                    row['date'],
-                    row['exercises_completed'],
-                    row['total_time'],
-                    ", ".join(row['exercises'])
-                ])
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) < EXPORT_CHUNK_SIZE:
+                    continue
+                writer.writerows(chunk)
+                written += len(chunk)
+                chunk = []
+                if progress is not None and progress(written, total) is False:
+                    cancelled = True
+                    break
+            writer.writerows(chunk)
+            written += len(chunk)
+        
+        if cancelled:
+            csv_path.unlink(missing_ok=True)
+            return None
         
+        if progress is not None:
+            progress(written, total)
         return csv_path
     
+    def count_range_days(self, start_date, end_date):
+        """Contar los días con estadísticas en un rango"""
+        conn = get_connection(self.db_path)
+        return conn.execute("""
+        SELECT COUNT(*) FROM daily_stats
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+        """, (self.user_id, start_date.strftime("%Y-%m-%d"),
+              end_date.strftime("%Y-%m-%d"))).fetchone()[0]
+    
+    def count_range_sessions(self, start_date, end_date):
+        """Contar las sesiones de un rango, incluidas las archivadas"""
+        conn = get_connection(self.db_path)
+        start, end = self.date_bounds(start_date, end_date)
+        return sum(row[0] for row in self.iter_sessions(conn, """
+        SELECT COUNT(*) FROM {sessions} es WHERE {range}
+        """, start, end))
+    
+    def iter_range_sessions(self, start_date, end_date):
+        """Recorrer las sesiones de un rango en orden (inicio, ejercicio, duración, completada)"""
+        conn = get_connection(self.db_path)
+        start, end = self.date_bounds(start_date, end_date)
+        return self.iter_sessions(conn, """
+        SELECT es.start_time, es.exercise_id, es.duration, es.completed
+        FROM {sessions} es
+        WHERE {range}
+        ORDER BY es.start_epoch
+        """, start, end)
+    
+    def date_bounds(self, start_date, end_date):
+        """Convertir un rango de fechas inclusivo en [inicio, fin) de datetimes"""
+        start = datetime.combine(start_date, datetime.min.time())
+        end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        return start, end
+    
+    def get_exercise_names(self):
+        """Nombres de los ejercicios por id (el catálogo está en exercises.db)"""
+        return load_exercise_names(self.exercises_db_path)
+    
     def get_range_stats(self, start_date, end_date):
         """Obtener estadísticas para un rango de fechas"""
-        conn = sqlite3.connect("database/stats.db")
-        cursor = conn.cursor()
+        with timed("reports.get_range_stats"):
+            return list(self.iter_range_stats(start_date, end_date))
+    
+    def iter_range_stats(self, start_date, end_date):
+        """Recorrer día a día las estadísticas de un rango de fechas
+        
+        Lee daily_stats con una consulta y las sesiones del rango con una
+        consulta por partición, ordenadas por hora, y las combina en una sola
+        pasada: el número de consultas no depende de la longitud del rango.
+        """
+        conn = get_connection(self.db_path)
         
         start_str = start_date.strftime("%Y-%m-%d")
         end_str = end_date.strftime("%Y-%m-%d")
         
-        # Obtener estadísticas diarias
-        cursor.execute("""
+        days = conn.execute("""
         SELECT date, exercises_completed, total_time
         FROM daily_stats
-        WHERE date BETWEEN ? AND ?
+        WHERE user_id = ? AND date BETWEEN ? AND ?
         ORDER BY date
-        """, (start_str, end_str))
-        
-        stats = []
-        for row in cursor.fetchall():
-            stats.append({
-                "date": row[0],
-                "exercises_completed": row[1],
-                "total_time": row[2],
+        """, (self.user_id, start_str, end_str)).fetchall()
+        
+        start, end = self.date_bounds(start_date, end_date)
+        sessions = self.iter_sessions(conn, """
+        SELECT COALESCE(es.local_day, substr(es.start_time, 1, 10)), es.exercise_id
+        FROM {sessions} es
+        WHERE {range}
+        ORDER BY es.start_epoch
+        """, start, end)
+        
+        # Ambas secuencias están ordenadas por día: combinarlas en una pasada
+        index = 0
+        current = None
+        names = self.get_exercise_names()
+        for day, exercise_id in sessions:
+            while current is None or current["date"] < day:
+                if current is not None:
+                    yield current
+                if index == len(days):
+                    return
+                date_str, completed, total_time = days[index]
+                index += 1
+                current = {
+                    "date": date_str,
+                    "exercises_completed": completed,
+                    "total_time": total_time,
+                    "exercises": []
+                }
+            if current["date"] == day:
+                current["exercises"].append(names.get(exercise_id, exercise_id))
+        
+        if current is not None:
+            yield current
+        for date_str, completed, total_time in days[index:]:
+            yield {
+                "date": date_str,
+                "exercises_completed": completed,
+                "total_time": total_time,
                 "exercises": []
-            })
+            }
+    
+    def query_sessions(self, conn, sql, start, end):
+        """Ejecutar una consulta de sesiones del usuario en [start, end)
         
-        # Obtener ejercicios para cada día
-        for day in stats:
-            cursor.execute("""
-            SELECT e.name
-            FROM exercise_sessions es
-            JOIN exercises e ON es.exercise_id = e.id
-            WHERE es.start_time BETWEEN ? AND ?
-            """, (
-                f"{day['date']}T00:00:00",
-                f"{day['date']}T23:59:59"
-            ))
-            
-            day['exercises'] = [row[0] for row in cursor.fetchall()]
+        La consulta usa {sessions} como tabla y {range} como condición; se
+        ejecuta en la base activa y en las particiones archivadas del rango.
+        Las filas aún sin época se buscan por el texto de start_time.
+        """
+        return list(self.iter_sessions(conn, sql, start, end))
+    
+    def iter_sessions(self, conn, sql, start, end):
+        """Como query_sessions, pero devolviendo las filas a medida que se leen
+        
+        Las particiones se recorren en orden cronológico, así que una consulta
+        ordenada por hora produce una secuencia ordenada en todo el rango.
+        """
+        range_condition = """es.user_id = ?
+              AND ((es.start_epoch >= ? AND es.start_epoch < ?)
+                   OR (es.start_epoch IS NULL AND es.start_time >= ? AND es.start_time < ?))"""
+        start_epoch, end_epoch = int(start.timestamp()), int(end.timestamp())
+        params = (self.user_id, start_epoch, end_epoch, start.isoformat(), end.isoformat())
         
-        conn.close()
-        return stats
\ No newline at end of file
+        for schema in iter_partitions(conn, start_epoch, end_epoch):
+            cursor = conn.execute(
+                sql.format(sessions=f"{schema}.exercise_sessions", range=range_condition),
+                params
+            )
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+                if not rows:
+                    break
+                yield from rows
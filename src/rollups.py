@@ -0,0 +1,166 @@
+# src/rollups.py
+from datetime import date
+from storage import get_connection, transaction
+from archiver import iter_partitions
+
+# Tabla de agregados -> columna clave (o columnas, si es compuesta)
+ROLLUP_TABLES = {
+    "hourly_rollup": "hour",
+    "weekly_rollup": "week",
+    "monthly_rollup": "month",
+    "exercise_rollup": "exercise_id",
+    # Desgloses por día de los reportes de periodo: su coste depende de los
+    # días del periodo y no del historial
+    "daily_exercise_rollup": ("day", "exercise_id"),
+    "daily_hourly_rollup": ("day", "hour"),
+}
+
+KEY_TYPES = {
+    "hour": "INTEGER",
+    "day": "TEXT",
+    "week": "TEXT",
+    "month": "TEXT",
+    "exercise_id": "TEXT",
+}
+
+
+def key_columns(table):
+    """Columnas de la clave de una tabla de agregados"""
+    key = ROLLUP_TABLES[table]
+    return key if isinstance(key, tuple) else (key,)
+
+
+def key_values(key):
+    """Valores de una clave de agregado como tupla"""
+    return key if isinstance(key, tuple) else (key,)
+
+
+def create_rollup_tables(cursor):
+    """Crear las tablas de agregados"""
+    for table in ROLLUP_TABLES:
+        columns = key_columns(table)
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            user_id INTEGER NOT NULL,
+            {", ".join(f"{column} {KEY_TYPES[column]} NOT NULL" for column in columns)},
+            sessions INTEGER NOT NULL DEFAULT 0,
+            exercises_completed INTEGER NOT NULL DEFAULT 0,
+            total_time INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, {", ".join(columns)})
+        ) WITHOUT ROWID
+        """)
+
+
+def iso_week(day):
+    """Semana ISO ('2024-W05') de una fecha 'YYYY-MM-DD'"""
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def rollup_keys(day, hour, exercise_id):
+    """Claves de cada tabla de agregados para una sesión"""
+    return {
+        "hourly_rollup": hour,
+        "weekly_rollup": iso_week(day),
+        "monthly_rollup": day[:7],
+        "exercise_rollup": exercise_id,
+        "daily_exercise_rollup": (day, exercise_id),
+        "daily_hourly_rollup": (day, hour),
+    }
+
+
+def aggregate_events(events):
+    """Agregar eventos de sesión en deltas por tabla y clave
+
+    Devuelve {tabla: {(usuario, clave): [sesiones, completadas, tiempo_total]}}.
+    """
+    deltas = {table: {} for table in ROLLUP_TABLES}
+    for event in events:
+        hour = int(event["start_time"][11:13])
+        keys = rollup_keys(event["local_day"], hour, event["exercise_id"])
+        for table, key in keys.items():
+            delta = deltas[table].setdefault((event["user_id"], key), [0, 0, 0])
+            delta[0] += 1
+            if event["completed"]:
+                delta[1] += 1
+                delta[2] += event["duration"]
+    return deltas
+
+
+def apply_rollups(cursor, events):
+    """Actualizar los agregados con nuevos eventos en la transacción abierta"""
+    for table, table_deltas in aggregate_events(events).items():
+        columns = key_columns(table)
+        cursor.executemany(f"""
+        INSERT INTO {table} (user_id, {", ".join(columns)}, sessions, exercises_completed, total_time)
+        VALUES (?, {", ".join("?" for _ in columns)}, ?, ?, ?)
+        ON CONFLICT(user_id, {", ".join(columns)}) DO UPDATE SET
+            sessions = sessions + excluded.sessions,
+            exercises_completed = exercises_completed + excluded.exercises_completed,
+            total_time = total_time + excluded.total_time
+        """, [(user_id, *key_values(key), *delta) for (user_id, key), delta in table_deltas.items()])
+
+
+def rebuild_rollups(db_path):
+    """Reconstruir daily_stats y todos los agregados desde exercise_sessions
+
+    Incluye las particiones archivadas, que se leen antes de abrir la
+    transacción de escritura.
+    """
+    conn = get_connection(db_path)
+    daily, totals = {}, {table: {} for table in ROLLUP_TABLES}
+    for schema in iter_partitions(conn):
+        read_session_totals(conn.cursor(), schema, daily, totals)
+
+    with transaction(db_path, "rollups.rebuild") as cursor:
+        write_session_totals(cursor, daily, totals)
+
+
+def read_session_totals(cursor, schema, daily, totals):
+    """Acumular totales diarios y de cada agregado desde un esquema"""
+    cursor.execute(f"""
+    SELECT user_id,
+           COALESCE(local_day, substr(start_time, 1, 10)),
+           CAST(substr(start_time, 12, 2) AS INTEGER),
+           exercise_id,
+           COUNT(*),
+           SUM(completed),
+           SUM(CASE WHEN completed THEN duration ELSE 0 END)
+    FROM {schema}.exercise_sessions
+    GROUP BY 1, 2, 3, 4
+    """)
+
+    for user_id, day, hour, exercise_id, sessions, completed, total_time in cursor.fetchall():
+        day_totals = daily.setdefault((user_id, day), [0, 0])
+        day_totals[0] += completed
+        day_totals[1] += total_time
+
+        for table, key in rollup_keys(day, hour, exercise_id).items():
+            entry = totals[table].setdefault((user_id, key), [0, 0, 0])
+            entry[0] += sessions
+            entry[1] += completed
+            entry[2] += total_time
+
+
+def write_session_totals(cursor, daily, totals):
+    """Sustituir daily_stats y los agregados por los totales dados"""
+    cursor.execute("DELETE FROM daily_stats")
+    cursor.executemany("""
+    INSERT INTO daily_stats (user_id, date, exercises_completed, total_time)
+    VALUES (?, ?, ?, ?)
+    """, [(*key, *values) for key, values in daily.items()])
+
+    for table, table_totals in totals.items():
+        columns = key_columns(table)
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.executemany(f"""
+        INSERT INTO {table} (user_id, {", ".join(columns)}, sessions, exercises_completed, total_time)
+        VALUES (?, {", ".join("?" for _ in columns)}, ?, ?, ?)
+        """, [(user_id, *key_values(key), *values) for (user_id, key), values in table_totals.items()])
+
+
+if __name__ == "__main__":
+    import sys
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "database/stats.db"
+    rebuild_rollups(db_path)
+    print(f"Agregados reconstruidos en {db_path}.")
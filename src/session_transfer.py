@@ -0,0 +1,227 @@
+# src/session_transfer.py
+"""Importación y exportación masiva de sesiones de stats.db
+
+Uso:
+    python session_transfer.py export sesiones.jsonl[.gz] [--user N] [--db ruta]
+    python session_transfer.py import sesiones.jsonl[.gz] [--user N] [--db ruta]
+
+El formato es una sesión por línea en JSON, como el diario de escritura
+diferida. Las sesiones se identifican por (usuario, época, ejercicio), así
+que importar dos veces el mismo archivo no duplica nada.
+"""
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from storage import get_connection, transaction, timed
+from archiver import iter_partitions
+from database_init import init_stats_db
+from migrations import backfill_session_epochs
+from rollups import apply_rollups
+from streaks import rebuild_lifetime
+from query_cache import bump_generation
+
+EXPORT_COLUMNS = (
+    "user_id", "exercise_id", "start_time", "start_epoch",
+    "local_day", "duration", "completed",
+)
+
+
+def open_sessions_file(path, mode):
+    """Abrir un archivo de sesiones, comprimido si termina en .gz"""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def export_sessions(db_path, path, user_id=None, chunk_size=10000):
+    """Exportar sesiones (incluidas las archivadas) leyendo por bloques
+
+    Salen por usuario y hora, en el orden del índice (user_id, start_epoch),
+    así que no hace falta ordenar en memoria. Devuelve el número de
+    sesiones exportadas.
+    """
+    conn = get_connection(db_path)
+    condition, params = "", ()
+    if user_id is not None:
+        condition, params = "WHERE user_id = ?", (user_id,)
+
+    exported = 0
+    with open_sessions_file(path, "w") as f, timed("transfer.export"):
+        for schema in iter_partitions(conn):
+            cursor = conn.execute(f"""
+            SELECT {", ".join(EXPORT_COLUMNS)}
+            FROM {schema}.exercise_sessions
+            {condition}
+            ORDER BY user_id, start_epoch
+            """, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    session = dict(zip(EXPORT_COLUMNS, row))
+                    session["completed"] = bool(session["completed"])
+                    f.write(json.dumps(session, ensure_ascii=False) + "\n")
+                exported += len(rows)
+    return exported
+
+
+def read_sessions(path, user_id=None):
+    """Leer sesiones de un archivo completando época y día local si faltan"""
+    with open_sessions_file(path, "r") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                session = json.loads(line)
+                start_time = session["start_time"]
+                start_epoch = session.get("start_epoch")
+                if start_epoch is None:
+                    start_epoch = int(datetime.fromisoformat(start_time).timestamp())
+                yield (
+                    user_id if user_id is not None else session.get("user_id", 1),
+                    session["exercise_id"],
+                    start_time,
+                    int(start_epoch),
+                    session.get("local_day") or start_time[:10],
+                    int(session["duration"]),
+                    bool(session["completed"]),
+                )
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Línea {number} ignorada: {e}")
+
+
+def import_sessions(db_path, path, user_id=None, chunk_size=20000):
+    """Importar sesiones en bloques sin duplicar las ya existentes
+
+    Cada bloque se inserta en una sola transacción junto con sus deltas de
+    daily_stats y de los agregados, así que solo se tocan los días y claves
+    afectados. Las rachas de los usuarios importados se recalculan al final.
+    Devuelve (importadas, duplicadas).
+    """
+    init_stats_db(Path(db_path))
+    # Los duplicados se detectan por start_epoch: rellenar antes las
+    # sesiones antiguas que aún no lo tienen
+    backfill_session_epochs(db_path)
+    conn = get_connection(db_path)
+    conn.execute("""
+    CREATE TEMP TABLE IF NOT EXISTS import_sessions (
+        user_id INTEGER NOT NULL,
+        exercise_id TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        start_epoch INTEGER NOT NULL,
+        local_day TEXT NOT NULL,
+        duration INTEGER NOT NULL,
+        completed BOOLEAN NOT NULL,
+        PRIMARY KEY (user_id, start_epoch, exercise_id)
+    ) WITHOUT ROWID
+    """)
+
+    imported = duplicates = 0
+    users = set()
+    chunk = []
+    for row in read_sessions(path, user_id):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            inserted = import_chunk(db_path, conn, chunk, users)
+            imported += inserted
+            duplicates += len(chunk) - inserted
+            chunk = []
+    if chunk:
+        inserted = import_chunk(db_path, conn, chunk, users)
+        imported += inserted
+        duplicates += len(chunk) - inserted
+
+    conn.execute("DROP TABLE temp.import_sessions")
+    if users:
+        rebuild_lifetime(db_path, sorted(users))
+    return imported, duplicates
+
+
+def import_chunk(db_path, conn, chunk, users):
+    """Insertar un bloque de sesiones nuevas y actualizar sus agregados"""
+    conn.execute("DELETE FROM temp.import_sessions")
+    conn.executemany(f"""
+    INSERT OR IGNORE INTO temp.import_sessions ({", ".join(EXPORT_COLUMNS)})
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, chunk)
+
+    # Descartar sesiones que ya están en particiones archivadas (ATTACH no
+    # se permite dentro de la transacción de escritura)
+    first_epoch = min(row[3] for row in chunk)
+    last_epoch = max(row[3] for row in chunk)
+    for schema in iter_partitions(conn, first_epoch, last_epoch + 1):
+        if schema != "main":
+            delete_existing(conn, schema)
+
+    with transaction(db_path, "transfer.import_chunk") as cursor:
+        delete_existing(cursor, "main")
+        cursor.execute(f"""
+        SELECT {", ".join(EXPORT_COLUMNS)} FROM temp.import_sessions
+        """)
+        events = [dict(zip(EXPORT_COLUMNS, row)) for row in cursor.fetchall()]
+
+        cursor.execute(f"""
+        INSERT INTO exercise_sessions ({", ".join(EXPORT_COLUMNS)})
+        SELECT {", ".join(EXPORT_COLUMNS)} FROM temp.import_sessions
+        ORDER BY start_epoch
+        """)
+
+        cursor.execute("""
+        INSERT INTO daily_stats (user_id, date, exercises_completed, total_time)
+        SELECT user_id, local_day, SUM(completed),
+               SUM(CASE WHEN completed THEN duration ELSE 0 END)
+        FROM temp.import_sessions
+        GROUP BY user_id, local_day
+        ON CONFLICT(user_id, date) DO UPDATE SET
+            exercises_completed = exercises_completed + excluded.exercises_completed,
+            total_time = total_time + excluded.total_time
+        """)
+        apply_rollups(cursor, events)
+        if events:
+            bump_generation(cursor)
+
+    users.update(event["user_id"] for event in events)
+    return len(events)
+
+
+def delete_existing(cursor, schema):
+    """Quitar del bloque temporal las sesiones presentes en un esquema"""
+    cursor.execute(f"""
+    DELETE FROM temp.import_sessions
+    WHERE EXISTS (
+        SELECT 1 FROM {schema}.exercise_sessions es
+        WHERE es.user_id = import_sessions.user_id
+          AND es.start_epoch = import_sessions.start_epoch
+          AND es.exercise_id = import_sessions.exercise_id
+    )
+    """)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar o exportar sesiones de stats.db")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("path", help="Archivo JSON por líneas (.jsonl o .jsonl.gz)")
+    parser.add_argument("--user", type=int,
+                        help="Usuario a exportar, o al que asignar las sesiones importadas")
+    parser.add_argument("--db", default="database/stats.db")
+    parser.add_argument("--chunk-size", type=int, default=20000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.action == "export":
+        count = export_sessions(args.db, args.path, args.user, args.chunk_size)
+        summary = f"{count} sesiones exportadas"
+    else:
+        count, duplicates = import_sessions(args.db, args.path, args.user, args.chunk_size)
+        summary = f"{count} sesiones importadas, {duplicates} duplicadas omitidas"
+        count += duplicates
+    elapsed = time.perf_counter() - start
+    print(f"{summary} en {elapsed:.1f} s ({count / max(elapsed, 1e-9):.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,111 +1,344 @@
 # src/stats_tracker.py
-import sqlite3
-from datetime import datetime
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 from PyQt5.QtCore import QObject
+from storage import get_connection, transaction, timed
+from query_cache import QueryCache, read_generation
+from write_behind import WriteBehindQueue
+from migrations import migrate_stats_db, start_backfill
+from rollups import aggregate_events, apply_rollups, rebuild_rollups, iso_week
+from streaks import apply_lifetime, rebuild_lifetime, advance, event_hour, load_state, summarize
 
 class StatsTracker(QObject):
-    def __init__(self):
+    def __init__(self, write_behind=False, user_id=1, db_path="database/stats.db"):
         super().__init__()
-        self.db_path = "database/stats.db"
+        self.db_path = db_path
+        self.user_id = user_id
         self.init_db()
+        
+        # Resultados de consultas; log_exercise invalida los días que toca y
+        # las importaciones y el archivado cambian data_generation
+        self.query_cache = QueryCache()
+        self.data_versions = {}  # Conexión -> último (data_version, total_changes) visto
+        self.generation = read_generation(get_connection(self.db_path))
+        
+        # Rellenar en segundo plano épocas de sesiones anteriores a la migración
+        self.backfill_thread = start_backfill(self.db_path)
+        
+        # Escritura diferida opcional de sesiones
+        self.write_queue = None
+        if write_behind:
+            self.write_queue = WriteBehindQueue(self.db_path, self.apply_events)
+            self.write_queue.start()
     
     def init_db(self):
         """Inicializar base de datos"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS exercise_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            exercise_id TEXT NOT NULL,
-            start_time TEXT NOT NULL,
-            duration INTEGER NOT NULL,
-            completed BOOLEAN NOT NULL
-        )
-        """)
-        
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS daily_stats (
-            date TEXT PRIMARY KEY,
-            exercises_completed INTEGER NOT NULL,
-            total_time INTEGER NOT NULL
-        )
-        """)
+        with transaction(self.db_path) as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS exercise_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                exercise_id TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                duration INTEGER NOT NULL,
+                completed BOOLEAN NOT NULL
+            )
+            """)
+            
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_stats (
+                date TEXT PRIMARY KEY,
+                exercises_completed INTEGER NOT NULL,
+                total_time INTEGER NOT NULL
+            )
+            """)
         
-        conn.commit()
-        conn.close()
+        migrate_stats_db(self.db_path)
     
     def log_exercise(self, exercise_id, duration, completed=True):
         """Registrar un ejercicio completado"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        now = datetime.now()
+        event = {
+            "user_id": self.user_id,
+            "exercise_id": exercise_id,
+            "start_time": now.isoformat(),
+            "start_epoch": int(now.timestamp()),
+            "local_day": now.strftime("%Y-%m-%d"),
+            "duration": duration,
+            "completed": bool(completed)
+        }
         
-        cursor.execute("""
-        INSERT INTO exercise_sessions (exercise_id, start_time, duration, completed)
-        VALUES (?, ?, ?, ?)
-        """, (exercise_id, datetime.now().isoformat(), duration, completed))
+        if self.write_queue is not None:
+            self.write_queue.put(event)
+        else:
+            with transaction(self.db_path, "stats.log_exercise") as cursor:
+                self.apply_events(cursor, [event])
         
-        # Actualizar estadísticas diarias
-        today = datetime.now().strftime("%Y-%m-%d")
-        cursor.execute("""
-        INSERT OR IGNORE INTO daily_stats (date, exercises_completed, total_time)
-        VALUES (?, 0, 0)
-        """, (today,))
+        # Las lecturas ya incluyen los eventos pendientes: basta con invalidar aquí
+        self.query_cache.invalidate_day(self.user_id, event["local_day"])
+    
+    def apply_events(self, cursor, events):
+        """Aplicar eventos de sesión dentro de una transacción abierta"""
+        cursor.executemany("""
+        INSERT INTO exercise_sessions
+            (user_id, exercise_id, start_time, start_epoch, local_day, duration, completed)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (e["user_id"], e["exercise_id"], e["start_time"], e["start_epoch"],
+             e["local_day"], e["duration"], e["completed"])
+            for e in events
+        ])
         
-        if completed:
+        # Actualizar estadísticas diarias
+        for event in events:
             cursor.execute("""
-            UPDATE daily_stats 
-            SET exercises_completed = exercises_completed + 1,
-                total_time = total_time + ?
-            WHERE date = ?
-            """, (duration, today))
+            INSERT OR IGNORE INTO daily_stats (user_id, date, exercises_completed, total_time)
+            VALUES (?, ?, 0, 0)
+            """, (event["user_id"], event["local_day"]))
+            
+            if event["completed"]:
+                cursor.execute("""
+                UPDATE daily_stats 
+                SET exercises_completed = exercises_completed + 1,
+                    total_time = total_time + ?
+                WHERE user_id = ? AND date = ?
+                """, (event["duration"], event["user_id"], event["local_day"]))
         
-        conn.commit()
-        conn.close()
+        # Agregados por hora, semana, mes y ejercicio en la misma transacción
+        apply_rollups(cursor, events)
+        
+        # Rachas y totales globales, sin volver a recorrer el historial
+        apply_lifetime(cursor, events)
+    
+    def rebuild_rollups(self):
+        """Reconstruir agregados, rachas y totales desde las sesiones (repara desajustes)"""
+        self.flush()
+        rebuild_rollups(self.db_path)
+        rebuild_lifetime(self.db_path)
+        self.query_cache.clear()
+    
+    def flush(self):
+        """Escribir en disco las sesiones pendientes"""
+        if self.write_queue is not None:
+            self.write_queue.flush()
+    
+    def close(self):
+        """Detener la escritura diferida vaciando la cola"""
+        if self.write_queue is not None:
+            self.write_queue.stop()
+            self.write_queue = None
+    
+    def pending_events(self):
+        """Contexto con los eventos pendientes de la cola (vacío sin cola)"""
+        if self.write_queue is not None:
+            return self.write_queue.snapshot()
+        return nullcontext([])
+    
+    def pending_daily_totals(self, pending):
+        """Agregar por día los eventos pendientes de escribir del usuario"""
+        totals = {}
+        for event in pending:
+            if not event["completed"] or event["user_id"] != self.user_id:
+                continue
+            day = event["local_day"]
+            completed, total_time = totals.get(day, (0, 0))
+            totals[day] = (completed + 1, total_time + event["duration"])
+        return totals
+    
+    def check_generation(self):
+        """Vaciar la caché si otro proceso o hilo ha hecho un cambio masivo
+        
+        data_version cambia cuando confirma otra conexión y total_changes con
+        las escrituras de la propia, así que sin escrituras no se lee ninguna
+        tabla.
+        """
+        conn = get_connection(self.db_path)
+        data_version = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+        if self.data_versions.get(id(conn)) == data_version:
+            return
+        self.data_versions[id(conn)] = data_version
+        generation = read_generation(conn)
+        if generation != self.generation:
+            self.generation = generation
+            self.query_cache.clear()
+    
+    def cached(self, name, day_range, compute, *args):
+        """Leer una consulta del usuario a través de la caché de resultados"""
+        self.check_generation()
+        return self.query_cache.get_or_compute(
+            (name, self.user_id, day_range, args), self.user_id, day_range,
+            lambda: compute(*args)
+        )
+    
+    def get_cache_stats(self):
+        """Obtener aciertos, fallos y desalojos de la caché de consultas"""
+        return self.query_cache.get_stats()
     
     def get_today_stats(self):
         """Obtener estadísticas de hoy"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         today = datetime.now().strftime("%Y-%m-%d")
-        cursor.execute("""
-        SELECT exercises_completed, total_time 
-        FROM daily_stats 
-        WHERE date = ?
-        """, (today,))
+        return self.cached("today", (today, today), self.query_today_stats, today)
+    
+    def query_today_stats(self, today):
+        """Consultar las estadísticas de un día"""
+        conn = get_connection(self.db_path)
         
-        result = cursor.fetchone()
-        conn.close()
+        with self.pending_events() as pending, timed("stats.get_today_stats"):
+            result = conn.execute("""
+            SELECT exercises_completed, total_time 
+            FROM daily_stats 
+            WHERE user_id = ? AND date = ?
+            """, (self.user_id, today)).fetchone()
         
+        stats = {"exercises_completed": 0, "total_time": 0}
         if result:
-            return {
+            stats = {
                 "exercises_completed": result[0],
                 "total_time": result[1]
             }
-        return {"exercises_completed": 0, "total_time": 0}
+        
+        # Incluir sesiones aún no escritas
+        completed, total_time = self.pending_daily_totals(pending).get(today, (0, 0))
+        stats["exercises_completed"] += completed
+        stats["total_time"] += total_time
+        return stats
     
     def get_weekly_stats(self):
         """Obtener estadísticas de la última semana"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-        SELECT date, exercises_completed, total_time 
-        FROM daily_stats 
-        WHERE date >= date('now', '-7 days')
-        ORDER BY date
-        """)
+        # Fecha de corte en hora local, igual que las sesiones registradas
+        now = datetime.now()
+        week_start = (now - timedelta(days=7)).strftime("%Y-%m-%d")
+        today = now.strftime("%Y-%m-%d")
+        return self.cached("weekly", (week_start, today), self.query_weekly_stats, week_start)
+    
+    def query_weekly_stats(self, week_start):
+        """Consultar las estadísticas diarias desde una fecha"""
+        conn = get_connection(self.db_path)
         
-        results = cursor.fetchall()
-        conn.close()
+        with self.pending_events() as pending, timed("stats.get_weekly_stats"):
+            results = conn.execute("""
+            SELECT date, exercises_completed, total_time 
+            FROM daily_stats 
+            WHERE user_id = ? AND date >= ?
+            ORDER BY date
+            """, (self.user_id, week_start)).fetchall()
         
-        stats = []
+        stats = {}
         for row in results:
-            stats.append({
+            stats[row[0]] = {
                 "date": row[0],
                 "exercises_completed": row[1],
                 "total_time": row[2]
-            })
+            }
+        
+        # Incluir sesiones aún no escritas
+        for day, (completed, total_time) in self.pending_daily_totals(pending).items():
+            if day < week_start:
+                continue
+            entry = stats.setdefault(day, {"date": day, "exercises_completed": 0, "total_time": 0})
+            entry["exercises_completed"] += completed
+            entry["total_time"] += total_time
         
-        return stats
\ No newline at end of file
+        return [stats[day] for day in sorted(stats)]
+    
+    def read_rollup(self, table, key_column, keys=None):
+        """Leer un agregado, incluyendo eventos pendientes de escribir"""
+        conn = get_connection(self.db_path)
+        
+        with self.pending_events() as pending, timed(f"stats.{table}"):
+            if keys is None:
+                rows = conn.execute(f"""
+                SELECT {key_column}, sessions, exercises_completed, total_time
+                FROM {table}
+                WHERE user_id = ?
+                """, (self.user_id,)).fetchall()
+            else:
+                placeholders = ", ".join("?" for _ in keys)
+                rows = conn.execute(f"""
+                SELECT {key_column}, sessions, exercises_completed, total_time
+                FROM {table}
+                WHERE user_id = ? AND {key_column} IN ({placeholders})
+                """, [self.user_id, *keys]).fetchall()
+        
+        totals = {row[0]: list(row[1:]) for row in rows}
+        for (user_id, key), delta in aggregate_events(pending)[table].items():
+            if user_id != self.user_id or (keys is not None and key not in keys):
+                continue
+            entry = totals.setdefault(key, [0, 0, 0])
+            for i, value in enumerate(delta):
+                entry[i] += value
+        
+        return [
+            {
+                key_column: key,
+                "sessions": values[0],
+                "exercises_completed": values[1],
+                "total_time": values[2]
+            }
+            for key, values in sorted(totals.items())
+        ]
+    
+    def get_hourly_distribution(self):
+        """Obtener sesiones por hora del día"""
+        return self.cached("hourly", None, self.read_rollup, "hourly_rollup", "hour")
+    
+    def get_weekly_totals(self, weeks=12):
+        """Obtener totales de las últimas semanas ISO"""
+        today = datetime.now().date()
+        keys = [
+            iso_week((today - timedelta(weeks=i)).isoformat())
+            for i in range(weeks - 1, -1, -1)
+        ]
+        day_range = ((today - timedelta(weeks=weeks)).isoformat(), today.isoformat())
+        return self.cached("weekly_totals", day_range, self.read_rollup,
+                           "weekly_rollup", "week", tuple(keys))
+    
+    def get_monthly_totals(self, months=12):
+        """Obtener totales de los últimos meses"""
+        today = datetime.now().date()
+        keys = []
+        year, month = today.year, today.month
+        for _ in range(months):
+            keys.append(f"{year:04d}-{month:02d}")
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        day_range = (f"{keys[-1]}-01", today.isoformat())
+        return self.cached("monthly_totals", day_range, self.read_rollup,
+                           "monthly_rollup", "month", tuple(reversed(keys)))
+    
+    def get_exercise_breakdown(self):
+        """Obtener totales por ejercicio"""
+        return self.cached("exercises", None, self.read_rollup, "exercise_rollup", "exercise_id")
+    
+    def get_lifetime_stats(self):
+        """Obtener totales y rachas del usuario (coste constante)"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        return self.cached("lifetime", None, self.query_lifetime_stats, today)
+    
+    def query_lifetime_stats(self, today):
+        """Consultar totales y rachas vigentes en una fecha"""
+        conn = get_connection(self.db_path)
+        
+        with self.pending_events() as pending, timed("stats.get_lifetime_stats"):
+            state = load_state(conn.cursor(), self.user_id)
+        
+        # Incluir sesiones aún no escritas
+        for event in pending:
+            if event["user_id"] == self.user_id:
+                advance(state, event["local_day"], event_hour(event),
+                        event["duration"], event["completed"])
+        
+        return summarize(state, today)
+    
+    def get_current_streak(self):
+        """Obtener la racha actual de días con pausas"""
+        return self.get_lifetime_stats()["current_streak"]
+    
+    def get_achievement_metrics(self):
+        """Obtener las métricas que usan las condiciones de logros"""
+        lifetime = self.get_lifetime_stats()
+        return {
+            "total_sessions": lifetime["total_sessions"],
+            "lifetime_sessions": lifetime["total_sessions"],
+            "current_streak": lifetime["current_streak"],
+            "early_sessions": lifetime["early_sessions"],
+            "weekly_days_completed": lifetime["weekly_days_completed"]
+        }
\ No newline at end of file
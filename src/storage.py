@@ -0,0 +1,139 @@
+# src/storage.py
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Pragmas aplicados a cada conexión nueva
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Número de sentencias preparadas que sqlite3 mantiene en caché por conexión
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_all_connections = []
+
+_timings_lock = threading.Lock()
+_timings = {}
+
+
+def get_connection(db_path):
+    """Obtener la conexión persistente del hilo actual para una base de datos"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = str(db_path)
+    conn = connections.get(key)
+    if conn is None:
+        conn = sqlite3.connect(
+            key,
+            isolation_level=None,  # Transacciones explícitas con transaction()
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        connections[key] = conn
+        with _registry_lock:
+            _all_connections.append(conn)
+    return conn
+
+
+@contextmanager
+def transaction(db_path, name=None):
+    """Ejecutar un bloque dentro de una transacción de escritura
+
+    Devuelve un cursor de la conexión del hilo. Las transacciones anidadas
+    reutilizan la transacción exterior.
+    """
+    conn = get_connection(db_path)
+    with timed(name):
+        if conn.in_transaction:
+            yield conn.cursor()
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+@contextmanager
+def timed(name):
+    """Medir la duración de una operación y acumularla en las métricas"""
+    if name is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _timings_lock:
+            entry = _timings.get(name)
+            if entry is None:
+                entry = _timings[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            entry["count"] += 1
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+
+
+def get_timings():
+    """Obtener métricas de tiempo por operación (en milisegundos)"""
+    with _timings_lock:
+        return {
+            name: {
+                "count": entry["count"],
+                "total_ms": entry["total"] * 1000,
+                "avg_ms": entry["total"] * 1000 / entry["count"],
+                "max_ms": entry["max"] * 1000,
+            }
+            for name, entry in _timings.items()
+        }
+
+
+def reset_timings():
+    """Reiniciar las métricas de tiempo"""
+    with _timings_lock:
+        _timings.clear()
+
+
+def close_thread_connections():
+    """Cerrar las conexiones abiertas por el hilo actual"""
+    connections = getattr(_local, "connections", None)
+    if not connections:
+        return
+
+    with _registry_lock:
+        for conn in connections.values():
+            if conn in _all_connections:
+                _all_connections.remove(conn)
+            conn.close()
+    connections.clear()
+
+
+def close_all_connections():
+    """Cerrar todas las conexiones abiertas (llamar al salir de la aplicación)"""
+    with _registry_lock:
+        for conn in _all_connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Conexión creada en otro hilo; se cierra al terminar ese hilo
+                pass
+        _all_connections.clear()
+    connections = getattr(_local, "connections", None)
+    if connections:
+        connections.clear()
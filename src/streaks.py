@@ -0,0 +1,209 @@
+# src/streaks.py
+from datetime import date, timedelta
+from rollups import iso_week
+from storage import get_connection, transaction
+from archiver import iter_partitions
+
+# Hora local antes de la cual una pausa cuenta como "temprana"
+EARLY_HOUR = 8
+
+# Usuarios por consulta al filtrar con IN (...), bajo el límite de variables
+USER_CHUNK = 500
+
+LIFETIME_COLUMNS = (
+    "total_sessions", "total_time", "current_streak", "longest_streak",
+    "last_active_day", "early_sessions", "week", "week_days",
+)
+
+
+def create_lifetime_table(cursor):
+    """Crear la tabla de estadísticas globales por usuario"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS lifetime_stats (
+        user_id INTEGER PRIMARY KEY,
+        total_sessions INTEGER NOT NULL DEFAULT 0,
+        total_time INTEGER NOT NULL DEFAULT 0,
+        current_streak INTEGER NOT NULL DEFAULT 0,
+        longest_streak INTEGER NOT NULL DEFAULT 0,
+        last_active_day TEXT,
+        early_sessions INTEGER NOT NULL DEFAULT 0,
+        week TEXT,
+        week_days INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+
+def empty_state():
+    """Estado inicial de un usuario sin sesiones"""
+    return {
+        "total_sessions": 0,
+        "total_time": 0,
+        "current_streak": 0,
+        "longest_streak": 0,
+        "last_active_day": None,
+        "early_sessions": 0,
+        "week": None,
+        "week_days": 0,
+    }
+
+
+def advance(state, day, hour, duration, completed):
+    """Actualizar el estado con una sesión en O(1)
+
+    Solo las sesiones completadas cuentan. Un día anterior al último activo
+    (sesión fuera de orden o cambio de zona horaria hacia atrás) suma a los
+    totales pero no altera la racha.
+    """
+    if not completed:
+        return state
+
+    state["total_sessions"] += 1
+    state["total_time"] += duration
+    if hour < EARLY_HOUR:
+        state["early_sessions"] += 1
+
+    last = state["last_active_day"]
+    if last is None:
+        state["current_streak"] = 1
+    elif day > last:
+        gap = (date.fromisoformat(day) - date.fromisoformat(last)).days
+        state["current_streak"] = state["current_streak"] + 1 if gap == 1 else 1
+    if last is None or day > last:
+        state["last_active_day"] = day
+    state["longest_streak"] = max(state["longest_streak"], state["current_streak"])
+
+    # Días de la semana ISO actual con al menos una pausa (máscara de bits)
+    week = iso_week(day)
+    weekday_bit = 1 << date.fromisoformat(day).weekday()
+    if state["week"] is None or week > state["week"]:
+        state["week"] = week
+        state["week_days"] = weekday_bit
+    elif week == state["week"]:
+        state["week_days"] |= weekday_bit
+
+    return state
+
+
+def event_hour(event):
+    """Hora local de un evento de sesión"""
+    return int(event["start_time"][11:13])
+
+
+def load_state(cursor, user_id):
+    """Leer el estado guardado de un usuario"""
+    cursor.execute(f"""
+    SELECT {", ".join(LIFETIME_COLUMNS)} FROM lifetime_stats WHERE user_id = ?
+    """, (user_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return empty_state()
+    return dict(zip(LIFETIME_COLUMNS, row))
+
+
+def save_state(cursor, user_id, state):
+    """Guardar el estado de un usuario"""
+    cursor.execute(f"""
+    INSERT OR REPLACE INTO lifetime_stats (user_id, {", ".join(LIFETIME_COLUMNS)})
+    VALUES (?, {", ".join("?" for _ in LIFETIME_COLUMNS)})
+    """, (user_id, *(state[column] for column in LIFETIME_COLUMNS)))
+
+
+def apply_lifetime(cursor, events):
+    """Actualizar rachas y totales con nuevos eventos en la transacción abierta"""
+    by_user = {}
+    for event in events:
+        by_user.setdefault(event["user_id"], []).append(event)
+
+    for user_id, user_events in by_user.items():
+        state = load_state(cursor, user_id)
+        for event in user_events:
+            advance(state, event["local_day"], event_hour(event),
+                    event["duration"], event["completed"])
+        save_state(cursor, user_id, state)
+
+
+def rebuild_lifetime(db_path, user_ids=None):
+    """Reconstruir rachas y totales desde exercise_sessions y sus archivos"""
+    conn = get_connection(db_path)
+    states = {user_id: empty_state() for user_id in (user_ids or [])}
+    # Las particiones llegan en orden cronológico, como exige advance()
+    for schema in iter_partitions(conn):
+        read_lifetime_states(conn.cursor(), schema, states, user_ids)
+
+    with transaction(db_path, "streaks.rebuild") as cursor:
+        write_lifetime_states(cursor, states, user_ids)
+
+
+def recompute_lifetime(cursor, user_ids=None):
+    """Recalcular el estado de la base activa en la transacción abierta"""
+    states = {user_id: empty_state() for user_id in (user_ids or [])}
+    read_lifetime_states(cursor, "main", states, user_ids)
+    write_lifetime_states(cursor, states, user_ids)
+
+
+def read_lifetime_states(cursor, schema, states, user_ids=None):
+    """Avanzar los estados por usuario con las sesiones de un esquema"""
+    if user_ids is None:
+        read_lifetime_chunk(cursor, schema, states)
+        return
+    user_ids = sorted(user_ids)
+    for start in range(0, len(user_ids), USER_CHUNK):
+        read_lifetime_chunk(cursor, schema, states, user_ids[start:start + USER_CHUNK])
+
+
+def read_lifetime_chunk(cursor, schema, states, user_ids=None):
+    """Avanzar los estados con las sesiones de un esquema y grupo de usuarios"""
+    condition = ""
+    params = []
+    if user_ids is not None:
+        condition = f"AND user_id IN ({', '.join('?' for _ in user_ids)})"
+        params = list(user_ids)
+
+    # Un registro por usuario y día, en orden, basta para reconstruir las rachas
+    cursor.execute(f"""
+    SELECT user_id,
+           COALESCE(local_day, substr(start_time, 1, 10)) AS day,
+           COUNT(*),
+           SUM(duration),
+           SUM(CAST(substr(start_time, 12, 2) AS INTEGER) < ?)
+    FROM {schema}.exercise_sessions
+    WHERE completed {condition}
+    GROUP BY user_id, day
+    ORDER BY user_id, day
+    """, (EARLY_HOUR, *params))
+
+    for user_id, day, sessions, total_time, early in cursor.fetchall():
+        state = states.setdefault(user_id, empty_state())
+        advance(state, day, EARLY_HOUR, total_time, True)
+        state["total_sessions"] += sessions - 1
+        state["early_sessions"] += early
+
+
+def write_lifetime_states(cursor, states, user_ids=None):
+    """Guardar los estados recalculados"""
+    if user_ids is None:
+        cursor.execute("DELETE FROM lifetime_stats")
+    for user_id, state in states.items():
+        save_state(cursor, user_id, state)
+
+
+def summarize(state, today):
+    """Convertir el estado guardado en métricas vigentes para una fecha
+
+    La racha actual se anula si el último día activo es anterior a ayer, y
+    los días de la semana solo cuentan si la semana guardada es la actual.
+    """
+    yesterday = (date.fromisoformat(today) - timedelta(days=1)).isoformat()
+    last = state["last_active_day"]
+    current_streak = state["current_streak"] if last is not None and last >= yesterday else 0
+    week_days = state["week_days"] if state["week"] == iso_week(today) else 0
+
+    return {
+        "total_sessions": state["total_sessions"],
+        "total_time": state["total_time"],
+        "current_streak": current_streak,
+        "longest_streak": state["longest_streak"],
+        "last_active_day": last,
+        "early_sessions": state["early_sessions"],
+        "weekly_days_completed": bin(week_days).count("1"),
+    }
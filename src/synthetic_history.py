@@ -0,0 +1,132 @@
+# src/synthetic_history.py
+"""Generador de historiales sintéticos de pausas activas
+
+Uso: python synthetic_history.py --db ruta [--users 100] [--years 3] [--seed 42]
+
+El resultado es reproducible: la misma semilla produce las mismas sesiones.
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from storage import transaction
+from database_init import init_stats_db
+from rollups import rebuild_rollups
+from streaks import rebuild_lifetime
+
+# Ejercicios usados en las sesiones: (id, nombre, tipo, duración)
+EXERCISE_CATALOG = [
+    ("neck_stretch", "Estiramiento de cuello", "stretch", 30),
+    ("shoulder_roll", "Rotación de hombros", "mobility", 30),
+    ("wrist_stretch", "Estiramiento de muñecas", "stretch", 20),
+    ("back_twist", "Giro de espalda", "mobility", 40),
+    ("deep_breath", "Respiración profunda", "breathing", 60),
+    ("eye_rest", "Descanso visual", "eyes", 20),
+]
+
+# Hábitos de pausa de un usuario medio
+DEFAULT_HABITS = {
+    "breaks_per_day": 4.0,          # Media en días laborables
+    "weekend_breaks_per_day": 0.5,  # Media en sábados y domingos
+    "skip_day_prob": 0.1,           # Probabilidad de no hacer ninguna pausa un día
+    "vacation_weeks": 3,            # Semanas seguidas sin pausas cada año
+    "completion_rate": 0.85,        # Proporción de pausas terminadas
+    "early_prob": 0.05,             # Probabilidad de una pausa antes del trabajo
+    "work_start": 8,
+    "work_end": 18,
+}
+
+INSERT_CHUNK = 50000
+
+
+def user_sessions(user_id, first_day, days, habits, seed):
+    """Generar las sesiones de un usuario como filas de exercise_sessions"""
+    rng = random.Random(seed * 1000003 + user_id)
+    # Cada usuario es más o menos constante que la media
+    intensity = rng.uniform(0.5, 1.5)
+    favourites = rng.sample(EXERCISE_CATALOG, 3)
+    vacation_start = rng.randrange(52 - habits["vacation_weeks"]) if habits["vacation_weeks"] else None
+
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        week = day.isocalendar()[1]
+        if vacation_start is not None and vacation_start <= week < vacation_start + habits["vacation_weeks"]:
+            continue
+        if rng.random() < habits["skip_day_prob"]:
+            continue
+
+        mean = habits["weekend_breaks_per_day"] if day.weekday() >= 5 else habits["breaks_per_day"]
+        count = max(0, round(rng.gauss(mean * intensity, mean * intensity / 2)))
+        for _ in range(count):
+            if rng.random() < habits["early_prob"]:
+                hour = rng.randrange(6, habits["work_start"])
+            else:
+                hour = rng.randrange(habits["work_start"], habits["work_end"])
+            start = datetime(day.year, day.month, day.day, hour,
+                             rng.randrange(60), rng.randrange(60))
+            exercise = rng.choice(favourites) if rng.random() < 0.7 else rng.choice(EXERCISE_CATALOG)
+            yield (
+                user_id, exercise[0], start.isoformat(), int(start.timestamp()),
+                day.isoformat(), exercise[3], rng.random() < habits["completion_rate"]
+            )
+
+
+def generate_history(db_path, users=100, years=3, habits=None, seed=42, end_day=None):
+    """Llenar stats.db con el historial sintético de varios usuarios
+
+    Las sesiones terminan en end_day (hoy por defecto). Los agregados y las
+    rachas se reconstruyen al final. Devuelve el número de sesiones.
+    """
+    habits = {**DEFAULT_HABITS, **(habits or {})}
+    end_day = end_day or date.today()
+    days = years * 365
+    first_day = end_day - timedelta(days=days - 1)
+
+    init_stats_db(Path(db_path))
+
+    inserted = 0
+    rows = []
+    for user_id in range(1, users + 1):
+        rows.extend(user_sessions(user_id, first_day, days, habits, seed))
+        if len(rows) >= INSERT_CHUNK:
+            inserted += insert_sessions(db_path, rows)
+            rows = []
+    inserted += insert_sessions(db_path, rows)
+
+    rebuild_rollups(db_path)
+    rebuild_lifetime(db_path)
+    return inserted
+
+
+def insert_sessions(db_path, rows):
+    """Insertar un bloque de sesiones en una sola transacción"""
+    with transaction(db_path, "synthetic.insert") as cursor:
+        cursor.executemany("""
+        INSERT INTO exercise_sessions
+            (user_id, exercise_id, start_time, start_epoch, local_day, duration, completed)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar historiales sintéticos en stats.db")
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    for name, value in DEFAULT_HABITS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    habits = {name: getattr(args, name) for name in DEFAULT_HABITS}
+    start = time.perf_counter()
+    inserted = generate_history(args.db, args.users, args.years, habits, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"{inserted} sesiones de {args.users} usuarios en {elapsed:.1f} s "
+          f"({inserted / elapsed:.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,7 +28,11 @@ def load_config():
         "work_interval": "50",
         "break_interval": "10",
         "minimize_to_tray": "true",
-        "start_on_login": "false"
+        "start_on_login": "false",
+        "write_behind": "true",
+        "user_id": "1",
+        "archive_after_days": "365",
+        "difficulty_weights": ""  # p. ej. "fácil:2,media:1"; vacío = todos igual
     }
     config["DEFAULT"] = default_config
     
@@ -52,6 +56,22 @@ def load_config():
     
     return config
 
+def parse_weights(text):
+    """Convertir "nombre:peso,nombre:peso" en un diccionario (None si está vacío)
+
+    Las entradas mal formadas se ignoran con un aviso.
+    """
+    weights = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition(":")
+        try:
+            weights[name.strip()] = int(weight)
+        except ValueError:
+            print(f"Ignoring invalid difficulty weight: {item.strip()!r}")
+    return weights or None
+
 def save_config(config):
     """Guardar configuración con manejo de errores"""
     app_folder = get_app_folder()
@@ -0,0 +1,256 @@
+# src/write_behind.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from storage import get_connection, transaction, close_thread_connections
+
+
+class WriteBehindQueue:
+    """Cola de escritura diferida con confirmación agrupada
+
+    Los eventos se guardan en memoria y en un diario (una línea JSON por
+    evento) y un hilo en segundo plano los aplica en lotes, cada uno en una
+    sola transacción. El número de secuencia del último evento aplicado se
+    guarda en la misma transacción, así que al recuperar el diario tras un
+    cierre inesperado no se duplican eventos.
+
+    El diario se escribe sin fsync: sobrevive a que se cierre el proceso,
+    pero no a un corte del sistema operativo. La cola admite como mucho
+    max_pending eventos sin confirmar; al llenarse, put() espera hasta
+    flush_interval a que el escritor la vacíe y, si sigue llena, confirma
+    él mismo los pendientes.
+    """
+
+    def __init__(self, db_path, apply_batch, journal_path=None,
+                 max_pending=1000, batch_size=50, flush_interval=2.0):
+        self.db_path = db_path
+        self.apply_batch = apply_batch  # apply_batch(cursor, events)
+        self.journal_path = Path(journal_path or f"{db_path}.journal")
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.journal = None  # Archivo del diario abierto para añadir
+        self.pending = []
+        self.in_flight = []  # Lote que se está confirmando
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()  # Los lotes se confirman en orden
+        self.condition = threading.Condition(self.lock)
+        self.running = False
+        self.thread = None
+        self.last_seq = 0
+
+        self.init_state()
+        self.recover()
+
+    def init_state(self):
+        """Crear la tabla con el último evento aplicado"""
+        with transaction(self.db_path) as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS write_behind_state (
+                journal TEXT PRIMARY KEY,
+                last_seq INTEGER NOT NULL
+            )
+            """)
+            cursor.execute(
+                "SELECT last_seq FROM write_behind_state WHERE journal = ?",
+                (self.journal_path.name,)
+            )
+            row = cursor.fetchone()
+        self.last_seq = row[0] if row else 0
+
+    def recover(self):
+        """Recuperar eventos del diario que no llegaron a la base de datos"""
+        if not self.journal_path.exists():
+            return
+
+        recovered = []
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea incompleta por un cierre inesperado
+                    continue
+                if event["seq"] > self.last_seq:
+                    recovered.append(event)
+
+        with self.lock:
+            self.pending = recovered
+            if recovered:
+                self.last_seq = recovered[-1]["seq"]
+            self.rewrite_journal()
+        if recovered:
+            self.flush()
+
+    def backlog(self):
+        """Eventos sin confirmar (pendientes y en el lote en curso)"""
+        return len(self.pending) + len(self.in_flight)
+
+    def put(self, event):
+        """Encolar un evento para escritura diferida
+
+        Con un lote completo despierta al hilo escritor. Con la cola llena
+        espera a que el escritor la vacíe (como mucho flush_interval) y, si
+        no hay escritor o no avanza, confirma los pendientes en este hilo.
+        """
+        with self.lock:
+            deadline = time.monotonic() + self.flush_interval
+            while self.running and self.backlog() >= self.max_pending:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                self.condition.notify_all()
+                self.condition.wait(timeout)
+            overflow = self.backlog() >= self.max_pending
+        if overflow:
+            self.flush()
+
+        with self.lock:
+            self.last_seq += 1
+            event = dict(event, seq=self.last_seq)
+            self.pending.append(event)
+            if self.journal is None:
+                self.journal = open(self.journal_path, "a", encoding="utf-8")
+            self.journal.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.journal.flush()  # Al sistema operativo, sin fsync
+
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify_all()
+
+    @contextmanager
+    def snapshot(self):
+        """Obtener los eventos pendientes dentro de una transacción de lectura
+
+        Las consultas hechas en el bloque ven la misma versión de la base
+        que write_behind_state, así que los eventos que el escritor ya ha
+        confirmado se descartan y ninguno se cuenta dos veces ni se pierde.
+        La cola solo se bloquea para copiar la lista.
+        """
+        with self.lock:
+            events = self.in_flight + self.pending
+
+        conn = get_connection(self.db_path)
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            row = conn.execute(
+                "SELECT last_seq FROM write_behind_state WHERE journal = ?",
+                (self.journal_path.name,)
+            ).fetchone()
+            applied = row[0] if row else 0
+            yield [event for event in events if event["seq"] > applied]
+        finally:
+            if own_transaction:
+                conn.execute("COMMIT")
+
+    def flush(self):
+        """Aplicar todos los eventos pendientes
+
+        Cada lote se saca de la cola bajo el bloqueo y se confirma fuera de
+        él, así que put() y las lecturas no esperan a la transacción.
+        """
+        with self.flush_lock:
+            while True:
+                with self.lock:
+                    if not self.pending:
+                        break
+                    batch = self.in_flight = self.pending[:self.batch_size]
+                    del self.pending[:len(batch)]
+                try:
+                    with transaction(self.db_path, "stats.write_behind_flush") as cursor:
+                        self.apply_batch(cursor, batch)
+                        cursor.execute("""
+                        INSERT OR REPLACE INTO write_behind_state (journal, last_seq)
+                        VALUES (?, ?)
+                        """, (self.journal_path.name, batch[-1]["seq"]))
+                except BaseException:
+                    with self.lock:
+                        self.pending[:0] = batch
+                        self.in_flight = []
+                    raise
+                with self.lock:
+                    self.in_flight = []
+                    self.condition.notify_all()  # Hay sitio en la cola
+            self.rewrite_journal()
+
+    def rewrite_journal(self):
+        """Reescribir el diario con los eventos todavía pendientes
+
+        El archivo temporal se escribe fuera del bloqueo; los eventos
+        encolados mientras tanto se añaden antes de sustituir el diario.
+        Un evento ya aplicado que quede en el diario no se repite al
+        recuperar, porque se filtra por número de secuencia.
+        """
+        with self.lock:
+            events = list(self.pending)
+            if not events:
+                self.close_journal()
+                if self.journal_path.exists():
+                    self.journal_path.unlink()
+                return
+
+        tmp_path = self.journal_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+        with self.lock:
+            newer = [event for event in self.pending if event["seq"] > events[-1]["seq"]]
+            if newer:
+                with open(tmp_path, "a", encoding="utf-8") as f:
+                    for event in newer:
+                        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            # Windows no permite sustituir un archivo abierto; put() lo reabre
+            self.close_journal()
+            os.replace(tmp_path, self.journal_path)
+
+    def close_journal(self):
+        """Cerrar el archivo del diario (con el bloqueo tomado)"""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def run_writer(self):
+        """Bucle del hilo escritor"""
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            with self.lock:
+                timeout = deadline - time.monotonic()
+                while (self.running and len(self.pending) < self.batch_size and timeout > 0):
+                    self.condition.wait(timeout)
+                    timeout = deadline - time.monotonic()
+                if not self.running:
+                    break
+                has_pending = bool(self.pending)
+
+            if has_pending:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error flushing stats queue: {e}")
+            deadline = time.monotonic() + self.flush_interval
+        close_thread_connections()
+
+    def start(self):
+        """Iniciar el hilo escritor"""
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.run_writer, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Detener el hilo escritor y vaciar la cola"""
+        with self.lock:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+        with self.lock:
+            self.close_journal()